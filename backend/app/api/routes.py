@@ -2,37 +2,48 @@
 
 import json
 import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, Response, Request
-from pydantic import BaseModel
-from sqlalchemy import select, func, and_, or_
+import ijson
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import (
+    Integer, case, column, delete, insert, literal, literal_column, select, text, update, func, and_, or_,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
 
-from app.db.database import get_session
+from app.core.auth import require_owner
+from app.db.database import IS_POSTGRES, SQLITE_SEARCH_FTS, get_ro_session, get_session
 from app.db.models import (
     Listing, Reservation, Message, KnowledgeEntry, MessageTemplate,
     InventoryLocation, InventoryItem, StockReport,
 )
+from app.services.ai_drafter import AIDrafter, get_drafter, invalidate_knowledge_cache
+from app.services.emergency import is_emergency_message, notify_all_emergency
+from app.services.inventory_ai import InventoryAI, get_inventory_ai
+from app.services.knowledge_importer import import_from_en_json_stream
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Will be set from main.py on startup
 _hosttools = None
 _ntfy = None
-_ai_drafter = None
-_inventory_ai = None
 
 
-def set_services(hosttools, ntfy, ai_drafter=None, inventory_ai=None):
-    global _hosttools, _ntfy, _ai_drafter, _inventory_ai
+def set_services(hosttools, ntfy):
+    global _hosttools, _ntfy
     _hosttools = hosttools
     _ntfy = ntfy
-    _ai_drafter = ai_drafter
-    _inventory_ai = inventory_ai
 
 
 # ---------------------------------------------------------------------------
@@ -109,7 +120,7 @@ async def logout(response: Response):
 @router.get("/listings")
 async def get_listings():
     """Get all synced listings."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         result = await session.execute(
             select(Listing).order_by(Listing.name)
         )
@@ -201,7 +212,7 @@ async def get_reservations(
     active_only: bool = True,
 ):
     """Get reservations, optionally filtered."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         query = select(Reservation).options(selectinload(Reservation.listing))
 
         if listing_id:
@@ -255,6 +266,21 @@ def _parse_num_guests(raw_value) -> int:
         return 1
 
 
+async def _insert_messages(session, rows: list[dict]) -> None:
+    """Insert Message rows as one batched statement.
+
+    Rows whose hosttools_id is already stored are skipped (ON CONFLICT DO
+    NOTHING), so re-syncing the same thread is idempotent.
+    """
+    if not rows:
+        return
+    dialect_insert = pg_insert if IS_POSTGRES else sqlite_insert
+    await session.execute(
+        dialect_insert(Message).on_conflict_do_nothing(index_elements=["hosttools_id"]),
+        rows,
+    )
+
+
 @router.post("/sync/reservations")
 async def sync_reservations(full_history: bool = False):
     """Pull reservations from Host Tools for all listings and sync to DB.
@@ -280,13 +306,14 @@ async def sync_reservations(full_history: bool = False):
             start = (date.today() - timedelta(days=30)).isoformat()
         end = (date.today() + timedelta(days=365)).isoformat()
 
+        # Fetch every listing's reservations concurrently; failures are logged and skipped
+        by_listing = await _hosttools.get_reservations_bulk(
+            [listing.hosttools_id for listing in listings], start, end
+        )
+
         for listing in listings:
-            try:
-                raw_reservations = await _hosttools.get_reservations(
-                    listing.hosttools_id, start, end
-                )
-            except Exception as e:
-                logger.error("Failed to fetch reservations for %s: %s", listing.name, e)
+            raw_reservations = by_listing.get(listing.hosttools_id)
+            if raw_reservations is None:
                 continue
 
             for raw in raw_reservations:
@@ -362,7 +389,21 @@ async def sync_reservations(full_history: bool = False):
 
                 # Extract messages from 'posts' (Host Tools terminology)
                 posts = raw.get("posts") or raw.get("messages") or raw.get("thread") or []
-                if isinstance(posts, list):
+                if isinstance(posts, list) and posts:
+                    # Dedup keys already stored for this reservation: hosttools message ID,
+                    # or timestamp + sender for messages without one
+                    existing = await session.execute(
+                        select(Message.hosttools_id, Message.timestamp, Message.sender)
+                        .where(Message.reservation_id == reservation.id)
+                    )
+                    seen_ids = set()
+                    seen_times = set()
+                    for row in existing:
+                        if row.hosttools_id:
+                            seen_ids.add(row.hosttools_id)
+                        seen_times.add((row.timestamp, row.sender))
+
+                    new_messages = []
                     for msg_raw in posts:
                         msg_body = msg_raw.get("message") or msg_raw.get("body") or msg_raw.get("text", "")
                         if not msg_body:
@@ -386,37 +427,27 @@ async def sync_reservations(full_history: bool = False):
                         # Dedup by reservation + hosttools message ID or timestamp + sender
                         ht_msg_id = msg_raw.get("_id", "")
                         if ht_msg_id:
-                            existing = await session.execute(
-                                select(Message).where(
-                                    and_(
-                                        Message.reservation_id == reservation.id,
-                                        Message.hosttools_id == ht_msg_id,
-                                    )
-                                )
-                            )
+                            if ht_msg_id in seen_ids:
+                                continue
+                            seen_ids.add(ht_msg_id)
                         else:
-                            existing = await session.execute(
-                                select(Message).where(
-                                    and_(
-                                        Message.reservation_id == reservation.id,
-                                        Message.timestamp == msg_time,
-                                        Message.sender == sender,
-                                    )
-                                )
-                            )
-                        if existing.scalar_one_or_none():
-                            continue
-
-                        message = Message(
-                            reservation_id=reservation.id,
-                            hosttools_id=ht_msg_id or None,
-                            timestamp=msg_time,
-                            sender=sender,
-                            body=msg_body,
-                            is_sent=True,
-                        )
-                        session.add(message)
-                        total_messages += 1
+                            # Stored timestamps come back naive
+                            time_key = (msg_time.replace(tzinfo=None), sender)
+                            if time_key in seen_times:
+                                continue
+                            seen_times.add(time_key)
+
+                        new_messages.append({
+                            "reservation_id": reservation.id,
+                            "hosttools_id": ht_msg_id or None,
+                            "timestamp": msg_time,
+                            "sender": sender,
+                            "body": msg_body,
+                            "is_sent": True,
+                        })
+
+                    await _insert_messages(session, new_messages)
+                    total_messages += len(new_messages)
 
                 total_synced += 1
 
@@ -441,7 +472,7 @@ async def sync_reservations(full_history: bool = False):
 @router.get("/stats")
 async def get_stats():
     """Get data stats for training overview."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         listings = (await session.execute(select(func.count(Listing.id)))).scalar()
         reservations = (await session.execute(select(func.count(Reservation.id)))).scalar()
         total_msgs = (await session.execute(select(func.count(Message.id)))).scalar()
@@ -483,7 +514,7 @@ async def get_conversations(include_empty: bool = False):
     By default only returns reservations that have messages.
     Set include_empty=true to also show reservations without messages.
     """
-    async with get_session() as session:
+    async with get_ro_session() as session:
         today = date.today()
         query = (
             select(Reservation)
@@ -492,7 +523,7 @@ async def get_conversations(include_empty: bool = False):
             .order_by(Reservation.check_in.desc())
         )
         result = await session.execute(query)
-        reservations = result.scalars().unique().all()
+        reservations = result.scalars().all()
 
         conversations = []
         for r in reservations:
@@ -564,7 +595,7 @@ async def get_conversations(include_empty: bool = False):
 @router.get("/conversations/{reservation_id}/messages")
 async def get_messages(reservation_id: int):
     """Get all messages for a reservation (conversation thread)."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         # Get reservation with listing info
         res_result = await session.execute(
             select(Reservation)
@@ -669,6 +700,8 @@ async def send_message(reservation_id: int, req: SendMessageRequest):
         except Exception as e:
             logger.error("Learning failed (non-fatal): %s", e)
 
+    # Learning may have added a knowledge entry
+    invalidate_knowledge_cache()
     return {"sent": True, "message_id": message.id}
 
 
@@ -677,14 +710,14 @@ async def send_message(reservation_id: int, req: SendMessageRequest):
 # ---------------------------------------------------------------------------
 
 @router.post("/conversations/{reservation_id}/draft")
-async def generate_draft(reservation_id: int):
+async def generate_draft(reservation_id: int, drafter: Optional[AIDrafter] = Depends(get_drafter)):
     """Generate an AI draft reply for a conversation."""
-    if not _ai_drafter:
+    if not drafter:
         raise HTTPException(status_code=503, detail="AI not configured (GEMINI_API_KEY not set)")
 
     async with get_session() as session:
         try:
-            result = await _ai_drafter.generate_draft(session, reservation_id)
+            result = await drafter.generate_draft(session, reservation_id)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
@@ -694,6 +727,39 @@ async def generate_draft(reservation_id: int):
     return result
 
 
+@router.post("/conversations/{reservation_id}/draft/stream")
+async def stream_draft(reservation_id: int, drafter: Optional[AIDrafter] = Depends(get_drafter)):
+    """Generate an AI draft reply as server-sent events.
+
+    Each event's data is {"text": ...} with the next chunk of raw model output,
+    then a final {"done": true, ...} with the same fields as /draft (or
+    {"error": ...} if generation fails). Disconnecting cancels the Gemini call.
+    """
+    if not drafter:
+        raise HTTPException(status_code=503, detail="AI not configured (GEMINI_API_KEY not set)")
+
+    async with get_ro_session() as session:
+        try:
+            user_prompt, knowledge_ids = await drafter.prepare_prompt(session, reservation_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            async for event in drafter.stream_draft(user_prompt, knowledge_ids):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            logger.error("AI draft streaming failed: %s", e, exc_info=True)
+            yield b"data: " + orjson.dumps({"error": "AI generation failed"}) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Content-Encoding keeps GZipMiddleware from buffering the events
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"},
+    )
+
+
 # ---------------------------------------------------------------------------
 # Knowledge Base
 # ---------------------------------------------------------------------------
@@ -707,7 +773,7 @@ class KnowledgeEntryRequest(BaseModel):
 @router.get("/knowledge")
 async def get_knowledge(category: Optional[str] = None):
     """Get knowledge base entries, optionally filtered by category."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         query = select(KnowledgeEntry).where(KnowledgeEntry.active == True)
         if category:
             query = query.where(KnowledgeEntry.category == category)
@@ -740,7 +806,8 @@ async def create_knowledge(req: KnowledgeEntryRequest):
         )
         session.add(entry)
         await session.flush()
-        return {"id": entry.id, "created": True}
+    invalidate_knowledge_cache()
+    return {"id": entry.id, "created": True}
 
 
 @router.put("/knowledge/{entry_id}")
@@ -756,7 +823,8 @@ async def update_knowledge(entry_id: int, req: KnowledgeEntryRequest):
         entry.category = req.category
         entry.question = req.question
         entry.answer = req.answer
-        return {"id": entry.id, "updated": True}
+    invalidate_knowledge_cache()
+    return {"id": entry_id, "updated": True}
 
 
 @router.delete("/knowledge/{entry_id}")
@@ -770,21 +838,23 @@ async def delete_knowledge(entry_id: int):
         if not entry:
             raise HTTPException(status_code=404, detail="Entry not found")
         entry.active = False
-        return {"id": entry_id, "deleted": True}
-
-
-class ImportKnowledgeRequest(BaseModel):
-    json_data: dict
-    replace: bool = True
+    invalidate_knowledge_cache()
+    return {"id": entry_id, "deleted": True}
 
 
 @router.post("/knowledge/import")
-async def import_knowledge(req: ImportKnowledgeRequest):
-    """Bulk import knowledge from 195vbr en.json data."""
-    from app.services.knowledge_importer import import_from_en_json
+async def import_knowledge(request: Request, replace: bool = True):
+    """Bulk import knowledge from 195vbr en.json data.
 
+    The body (raw en.json, or wrapped as {"json_data": ...}) is parsed as it
+    streams in rather than buffered into a dict.
+    """
     async with get_session() as session:
-        count = await import_from_en_json(session, req.json_data, req.replace)
+        try:
+            count = await import_from_en_json_stream(session, request.stream(), replace)
+        except ijson.JSONError as e:
+            raise HTTPException(400, f"Invalid JSON: {e}")
+    invalidate_knowledge_cache()
     return {"imported": count}
 
 
@@ -804,11 +874,18 @@ class TemplateRequest(BaseModel):
 @router.get("/templates")
 async def list_templates():
     """List all message templates."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         result = await session.execute(
-            select(MessageTemplate).order_by(MessageTemplate.trigger)
+            select(
+                MessageTemplate.id,
+                MessageTemplate.name,
+                MessageTemplate.trigger,
+                MessageTemplate.body,
+                MessageTemplate.hours_offset,
+                MessageTemplate.enabled,
+                MessageTemplate.house_code,
+            ).order_by(MessageTemplate.trigger)
         )
-        templates = result.scalars().all()
         return [
             {
                 "id": t.id,
@@ -819,7 +896,7 @@ async def list_templates():
                 "enabled": t.enabled,
                 "house_code": t.house_code,
             }
-            for t in templates
+            for t in result
         ]
 
 
@@ -827,17 +904,10 @@ async def list_templates():
 async def create_template(req: TemplateRequest):
     """Create a new message template."""
     async with get_session() as session:
-        template = MessageTemplate(
-            name=req.name,
-            trigger=req.trigger,
-            body=req.body,
-            hours_offset=req.hours_offset,
-            enabled=req.enabled,
-            house_code=req.house_code,
+        result = await session.execute(
+            insert(MessageTemplate).values(**req.model_dump()).returning(MessageTemplate.id)
         )
-        session.add(template)
-        await session.flush()
-        return {"id": template.id, "created": True}
+        return {"id": result.scalar_one(), "created": True}
 
 
 @router.put("/templates/{template_id}")
@@ -845,18 +915,20 @@ async def update_template(template_id: int, req: TemplateRequest):
     """Update a message template."""
     async with get_session() as session:
         result = await session.execute(
-            select(MessageTemplate).where(MessageTemplate.id == template_id)
+            update(MessageTemplate)
+            .where(MessageTemplate.id == template_id)
+            .values(
+                name=req.name,
+                trigger=req.trigger,
+                body=req.body,
+                hours_offset=req.hours_offset,
+                enabled=req.enabled,
+                house_code=req.house_code,
+            )
         )
-        template = result.scalar_one_or_none()
-        if not template:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Template not found")
-        template.name = req.name
-        template.trigger = req.trigger
-        template.body = req.body
-        template.hours_offset = req.hours_offset
-        template.enabled = req.enabled
-        template.house_code = req.house_code
-        return {"id": template.id, "updated": True}
+        return {"id": template_id, "updated": True}
 
 
 @router.delete("/templates/{template_id}")
@@ -864,12 +936,10 @@ async def delete_template(template_id: int):
     """Delete a message template."""
     async with get_session() as session:
         result = await session.execute(
-            select(MessageTemplate).where(MessageTemplate.id == template_id)
+            delete(MessageTemplate).where(MessageTemplate.id == template_id)
         )
-        template = result.scalar_one_or_none()
-        if not template:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Template not found")
-        await session.delete(template)
         return {"id": template_id, "deleted": True}
 
 
@@ -888,7 +958,7 @@ class WebhookMessagePayload(BaseModel):
 
 
 @router.post("/webhooks/hosttools/message")
-async def webhook_message(payload: WebhookMessagePayload):
+async def webhook_message(payload: WebhookMessagePayload, background_tasks: BackgroundTasks):
     """Receive new message webhook from Host Tools."""
     logger.info("Webhook received: message from %s", payload.guestName or "unknown")
 
@@ -898,38 +968,35 @@ async def webhook_message(payload: WebhookMessagePayload):
     async with get_session() as session:
         # Find reservation
         res_result = await session.execute(
-            select(Reservation).where(Reservation.hosttools_id == payload.reservationId)
+            select(Reservation.id, Reservation.guest_name)
+            .where(Reservation.hosttools_id == payload.reservationId)
         )
-        reservation = res_result.scalar_one_or_none()
+        reservation = res_result.first()
 
         if not reservation:
             logger.warning("Webhook: unknown reservation %s", payload.reservationId)
             return {"ok": True, "skipped": "unknown reservation"}
 
         # Store message
-        message = Message(
+        session.add(Message(
             reservation_id=reservation.id,
             timestamp=datetime.utcnow(),
             sender="guest",
             body=payload.message,
             is_sent=True,
             needs_review=True,
-        )
-        session.add(message)
+        ))
 
-    # Send ntfy notification
+    # Send ntfy notification after the response so Host Tools isn't kept waiting
     if _ntfy:
-        from app.services.ntfy import is_emergency_message
-
+        guest_name = payload.guestName or reservation.guest_name
         if is_emergency_message(payload.message):
-            await _ntfy.notify_emergency(
-                guest_name=payload.guestName or reservation.guest_name,
-                message_text=payload.message,
+            background_tasks.add_task(
+                notify_all_emergency, [_ntfy], guest_name=guest_name, message_text=payload.message,
             )
         else:
-            await _ntfy.notify_new_message(
-                guest_name=payload.guestName or reservation.guest_name,
-                message_preview=payload.message,
+            background_tasks.add_task(
+                _ntfy.notify_new_message, guest_name=guest_name, message_preview=payload.message,
             )
 
     return {"ok": True, "stored": True}
@@ -958,13 +1025,15 @@ async def webhook_reservation(payload: WebhookReservationPayload):
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
+    drafter = await get_drafter()
+    inventory_ai = await get_inventory_ai()
     return {
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat(),
         "hosttools_configured": bool(_hosttools and _hosttools.auth_token),
         "ntfy_configured": bool(_ntfy and _ntfy.configured),
-        "ai_configured": bool(_ai_drafter),
-        "inventory_ai_configured": bool(_inventory_ai),
+        "ai_configured": bool(drafter),
+        "inventory_ai_configured": bool(inventory_ai),
     }
 
 
@@ -983,65 +1052,114 @@ class LocationRequest(BaseModel):
     outdoor: bool = False
 
 
-def _serialize_location(loc: InventoryLocation, include_children: bool = False) -> dict:
-    """Serialize a location to a dict."""
-    d = {
-        "id": loc.id,
-        "house_code": loc.house_code,
-        "name": loc.name,
-        "code": loc.code,
-        "parent_id": loc.parent_id,
-        "description": loc.description,
-        "guest_accessible": loc.guest_accessible,
-        "locked": loc.locked,
-        "outdoor": loc.outdoor,
-        "sort_order": loc.sort_order,
-        "item_count": len(loc.items) if loc.items else 0,
-    }
-    if include_children and loc.children:
-        d["children"] = [_serialize_location(c) for c in loc.children]
-    return d
+# Unresolved stock-report count per item
+_alert_counts = (
+    select(StockReport.item_id, func.count().label("alert_count"))
+    .where(StockReport.resolved == False)
+    .group_by(StockReport.item_id)
+    .subquery()
+)
+
+
+def _item_rows_query():
+    """Column-level select of everything _serialize_item_row needs (no ORM hydration)."""
+    return (
+        select(
+            InventoryItem.id,
+            InventoryItem.name,
+            InventoryItem.category,
+            InventoryItem.location_id,
+            InventoryLocation.name.label("location_name"),
+            InventoryLocation.code.label("location_code"),
+            InventoryLocation.house_code,
+            InventoryItem.quantity,
+            InventoryItem.unit,
+            InventoryItem.min_quantity,
+            InventoryItem.brand,
+            InventoryItem.purchase_url,
+            InventoryItem.status,
+            InventoryItem.notes,
+            InventoryItem.product_description,
+            InventoryItem.usage_instructions,
+            InventoryItem.suitable_for,
+            func.coalesce(_alert_counts.c.alert_count, 0).label("alert_count"),
+            InventoryItem.created_at,
+            InventoryItem.updated_at,
+        )
+        .outerjoin(InventoryLocation, InventoryItem.location_id == InventoryLocation.id)
+        .outerjoin(_alert_counts, _alert_counts.c.item_id == InventoryItem.id)
+    )
+
 
+def _serialize_item_row(row) -> dict:
+    """Serialize a row from _item_rows_query to a dict.
 
-def _serialize_item(item: InventoryItem) -> dict:
-    """Serialize an inventory item to a dict."""
-    loc = item.location
-    unresolved = [r for r in (item.stock_reports or []) if not r.resolved]
+    Timestamps are left as datetimes for orjson to encode, so callers return
+    ORJSONResponse directly instead of going through jsonable_encoder.
+    """
     return {
-        "id": item.id,
-        "name": item.name,
-        "category": item.category,
-        "location_id": item.location_id,
-        "location_name": loc.name if loc else None,
-        "location_code": loc.code if loc else None,
-        "house_code": loc.house_code if loc else None,
-        "quantity": item.quantity,
-        "unit": item.unit,
-        "min_quantity": item.min_quantity,
-        "brand": item.brand,
-        "purchase_url": item.purchase_url,
-        "status": item.status,
-        "notes": item.notes,
-        "product_description": item.product_description,
-        "usage_instructions": item.usage_instructions,
-        "suitable_for": item.suitable_for,
-        "has_alert": len(unresolved) > 0,
-        "alert_count": len(unresolved),
-        "created_at": item.created_at.isoformat() if item.created_at else None,
-        "updated_at": item.updated_at.isoformat() if item.updated_at else None,
+        "id": row.id,
+        "name": row.name,
+        "category": row.category,
+        "location_id": row.location_id,
+        "location_name": row.location_name,
+        "location_code": row.location_code,
+        "house_code": row.house_code,
+        "quantity": row.quantity,
+        "unit": row.unit,
+        "min_quantity": row.min_quantity,
+        "brand": row.brand,
+        "purchase_url": row.purchase_url,
+        "status": row.status,
+        "notes": row.notes,
+        "product_description": row.product_description,
+        "usage_instructions": row.usage_instructions,
+        "suitable_for": row.suitable_for,
+        "has_alert": row.alert_count > 0,
+        "alert_count": row.alert_count,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
     }
 
 
-async def _get_locations_context(session) -> list[dict]:
-    """Get all locations formatted for AI context injection."""
-    result = await session.execute(
-        select(InventoryLocation)
-        .options(selectinload(InventoryLocation.parent))
-        .where(InventoryLocation.active == True)
-        .order_by(InventoryLocation.sort_order)
-    )
-    locations = result.scalars().all()
-    return [
+@dataclass(frozen=True)
+class LocationsContext:
+    """Snapshot of active locations shared by the AI endpoints."""
+    context: list[dict]  # prompt-ready location dicts
+    code_to_id: dict[str, int]
+    code_to_loc: dict[str, dict]
+    expires: float
+
+
+# In-process memo for _get_locations_cached — locations change rarely, AI calls often
+LOCATIONS_CONTEXT_TTL = 60  # seconds
+_locations_ctx: Optional[LocationsContext] = None
+
+
+def _invalidate_locations_context():
+    """Drop the cached locations context (call after any location write commits)."""
+    global _locations_ctx
+    _locations_ctx = None
+
+
+async def _get_locations_cached() -> LocationsContext:
+    """Get all active locations formatted for AI context injection, plus code lookups.
+
+    Served from a short TTL cache; the returned lists/dicts are shared, so don't mutate them.
+    """
+    global _locations_ctx
+    if _locations_ctx is not None and _locations_ctx.expires > time.monotonic():
+        return _locations_ctx
+
+    async with get_ro_session() as session:
+        result = await session.execute(
+            select(InventoryLocation)
+            .options(selectinload(InventoryLocation.parent))
+            .where(InventoryLocation.active == True)
+            .order_by(InventoryLocation.sort_order)
+        )
+        locations = result.scalars().all()
+    context = [
         {
             "id": loc.id,
             "code": loc.code,
@@ -1055,106 +1173,129 @@ async def _get_locations_context(session) -> list[dict]:
         }
         for loc in locations
     ]
+    code_to_loc = {loc["code"]: loc for loc in context if loc["code"]}
+    _locations_ctx = LocationsContext(
+        context=context,
+        code_to_id={code: loc["id"] for code, loc in code_to_loc.items()},
+        code_to_loc=code_to_loc,
+        expires=time.monotonic() + LOCATIONS_CONTEXT_TTL,
+    )
+    return _locations_ctx
 
 
 @router.get("/inventory/locations")
 async def get_inventory_locations(house_code: Optional[str] = None):
-    """Get all storage locations, optionally filtered by house."""
-    async with get_session() as session:
+    """Get all storage locations as a tree, optionally filtered by house."""
+    async with get_ro_session() as session:
+        item_counts = (
+            select(InventoryItem.location_id, func.count().label("item_count"))
+            .where(InventoryItem.active == True)
+            .group_by(InventoryItem.location_id)
+            .subquery()
+        )
         query = (
-            select(InventoryLocation)
-            .options(
-                selectinload(InventoryLocation.children).selectinload(InventoryLocation.items),
-                selectinload(InventoryLocation.children).selectinload(InventoryLocation.children),
-                selectinload(InventoryLocation.items),
+            select(
+                InventoryLocation.id,
+                InventoryLocation.house_code,
+                InventoryLocation.name,
+                InventoryLocation.code,
+                InventoryLocation.parent_id,
+                InventoryLocation.description,
+                InventoryLocation.guest_accessible,
+                InventoryLocation.locked,
+                InventoryLocation.outdoor,
+                InventoryLocation.sort_order,
+                func.coalesce(item_counts.c.item_count, 0).label("item_count"),
             )
+            .outerjoin(item_counts, item_counts.c.location_id == InventoryLocation.id)
             .where(InventoryLocation.active == True)
         )
         if house_code:
             query = query.where(InventoryLocation.house_code == house_code)
-        query = query.where(InventoryLocation.parent_id == None)  # top-level only
         query = query.order_by(InventoryLocation.sort_order, InventoryLocation.house_code, InventoryLocation.name)
         result = await session.execute(query)
-        locations = result.scalars().unique().all()
-        return [_serialize_location(loc, include_children=True) for loc in locations]
-
-
-@router.post("/inventory/locations")
-async def create_inventory_location(req: LocationRequest, request: Request):
+        locations = [dict(row) for row in result.mappings().all()]
+
+    # Assemble the tree from the flat list: group by parent, then attach
+    children_by_parent: dict[int, list[dict]] = defaultdict(list)
+    for loc in locations:
+        if loc["parent_id"] is not None:
+            children_by_parent[loc["parent_id"]].append(loc)
+    for loc in locations:
+        children = children_by_parent.get(loc["id"])
+        if children:
+            loc["children"] = children
+    return [loc for loc in locations if loc["parent_id"] is None]
+
+
+@router.post("/inventory/locations", dependencies=[Depends(require_owner)])
+async def create_inventory_location(req: LocationRequest):
     """Create a new storage location."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
-        loc = InventoryLocation(
-            house_code=req.house_code,
-            name=req.name,
-            code=req.code,
-            parent_id=req.parent_id,
-            description=req.description,
-            guest_accessible=req.guest_accessible,
-            locked=req.locked,
-            outdoor=req.outdoor,
+        result = await session.execute(
+            insert(InventoryLocation).values(**req.model_dump()).returning(InventoryLocation.id)
         )
-        session.add(loc)
-        await session.flush()
-        return {"id": loc.id, "created": True}
+        loc_id = result.scalar_one()
+    _invalidate_locations_context()
+    return {"id": loc_id, "created": True}
 
 
-@router.put("/inventory/locations/{location_id}")
-async def update_inventory_location(location_id: int, req: LocationRequest, request: Request):
+@router.put("/inventory/locations/{location_id}", dependencies=[Depends(require_owner)])
+async def update_inventory_location(location_id: int, req: LocationRequest):
     """Update a storage location."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
         result = await session.execute(
-            select(InventoryLocation).where(InventoryLocation.id == location_id)
+            update(InventoryLocation)
+            .where(InventoryLocation.id == location_id)
+            .values(
+                house_code=req.house_code,
+                name=req.name,
+                code=req.code,
+                parent_id=req.parent_id,
+                description=req.description,
+                guest_accessible=req.guest_accessible,
+                locked=req.locked,
+                outdoor=req.outdoor,
+            )
         )
-        loc = result.scalar_one_or_none()
-        if not loc:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Location not found")
-        loc.house_code = req.house_code
-        loc.name = req.name
-        loc.code = req.code
-        loc.parent_id = req.parent_id
-        loc.description = req.description
-        loc.guest_accessible = req.guest_accessible
-        loc.locked = req.locked
-        loc.outdoor = req.outdoor
-        return {"id": loc.id, "updated": True}
-
-
-@router.delete("/inventory/locations/{location_id}")
-async def delete_inventory_location(location_id: int, request: Request):
+    _invalidate_locations_context()
+    return {"id": location_id, "updated": True}
+
+
+@router.delete("/inventory/locations/{location_id}", dependencies=[Depends(require_owner)])
+async def delete_inventory_location(location_id: int):
     """Soft-delete a storage location."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
         result = await session.execute(
-            select(InventoryLocation).where(InventoryLocation.id == location_id)
+            update(InventoryLocation)
+            .where(InventoryLocation.id == location_id)
+            .values(active=False)
         )
-        loc = result.scalar_one_or_none()
-        if not loc:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Location not found")
-        loc.active = False
-        return {"id": location_id, "deleted": True}
+    _invalidate_locations_context()
+    return {"id": location_id, "deleted": True}
 
 
 # ---------------------------------------------------------------------------
 # Inventory — Seed Locations
 # ---------------------------------------------------------------------------
 
-@router.post("/inventory/locations/seed")
-async def seed_inventory_locations(request: Request):
+@router.post("/inventory/locations/seed", dependencies=[Depends(require_owner)])
+async def seed_inventory_locations():
     """Seed initial storage locations from STORAGE_LOCATIONS.md data."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
 
     # Check if already seeded
     async with get_session() as session:
-        count = (await session.execute(
-            select(func.count(InventoryLocation.id))
-        )).scalar()
-        if count > 0:
+        exists_row = (await session.execute(
+            select(InventoryLocation.id).limit(1)
+        )).first()
+        if exists_row:
+            count = (await session.execute(
+                select(func.count(InventoryLocation.id))
+            )).scalar()
             return {"seeded": False, "message": "Locations already exist", "count": count}
 
     SEED_LOCATIONS = [
@@ -1222,34 +1363,36 @@ async def seed_inventory_locations(request: Request):
     ]
 
     async with get_session() as session:
-        # First pass: create all locations without parents
-        code_to_id = {}
-        for i, loc_data in enumerate(SEED_LOCATIONS):
-            loc = InventoryLocation(
-                code=loc_data["code"],
-                house_code=loc_data["house_code"],
-                name=loc_data["name"],
-                outdoor=loc_data.get("outdoor", False),
-                locked=loc_data.get("locked", False),
-                guest_accessible=loc_data.get("guest_accessible", False),
-                description=loc_data.get("description"),
-                sort_order=i,
-            )
-            session.add(loc)
-            await session.flush()
-            code_to_id[loc_data["code"]] = loc.id
-
-        # Second pass: set parent_ids
-        for loc_data in SEED_LOCATIONS:
-            parent_code = loc_data.get("parent_code")
-            if parent_code and parent_code in code_to_id:
-                result = await session.execute(
-                    select(InventoryLocation).where(InventoryLocation.code == loc_data["code"])
-                )
-                loc = result.scalar_one_or_none()
-                if loc:
-                    loc.parent_id = code_to_id[parent_code]
+        # First pass: bulk-insert all locations without parents
+        rows = [
+            {
+                "code": loc_data["code"],
+                "house_code": loc_data["house_code"],
+                "name": loc_data["name"],
+                "outdoor": loc_data.get("outdoor", False),
+                "locked": loc_data.get("locked", False),
+                "guest_accessible": loc_data.get("guest_accessible", False),
+                "description": loc_data.get("description"),
+                "sort_order": i,
+            }
+            for i, loc_data in enumerate(SEED_LOCATIONS)
+        ]
+        result = await session.execute(
+            insert(InventoryLocation).returning(InventoryLocation.id, InventoryLocation.code),
+            rows,
+        )
+        code_to_id = {code: loc_id for loc_id, code in result.all()}
+
+        # Second pass: set parent_ids in one executemany, keyed by primary key
+        parent_rows = [
+            {"id": code_to_id[loc_data["code"]], "parent_id": code_to_id[loc_data["parent_code"]]}
+            for loc_data in SEED_LOCATIONS
+            if loc_data.get("parent_code") in code_to_id
+        ]
+        if parent_rows:
+            await session.execute(update(InventoryLocation), parent_rows)
 
+    _invalidate_locations_context()
     return {"seeded": True, "count": len(SEED_LOCATIONS)}
 
 
@@ -1282,19 +1425,10 @@ async def get_inventory_items(
     low_stock: bool = False,
 ):
     """Get inventory items with optional filters."""
-    async with get_session() as session:
-        query = (
-            select(InventoryItem)
-            .options(
-                selectinload(InventoryItem.location),
-                selectinload(InventoryItem.stock_reports),
-            )
-            .where(InventoryItem.active == True)
-        )
+    async with get_ro_session() as session:
+        query = _item_rows_query().where(InventoryItem.active == True)
         if house_code:
-            query = query.outerjoin(InventoryLocation).where(
-                InventoryLocation.house_code == house_code
-            )
+            query = query.where(InventoryLocation.house_code == house_code)
         if category:
             query = query.where(InventoryItem.category == category)
         if location_id:
@@ -1310,113 +1444,100 @@ async def get_inventory_items(
             )
         query = query.order_by(InventoryItem.name)
         result = await session.execute(query)
-        items = result.scalars().unique().all()
-        return [_serialize_item(item) for item in items]
+        return ORJSONResponse([_serialize_item_row(row) for row in result])
 
 
 @router.get("/inventory/items/{item_id}")
 async def get_inventory_item(item_id: int):
     """Get a single inventory item."""
-    async with get_session() as session:
+    async with get_ro_session() as session:
         result = await session.execute(
-            select(InventoryItem)
-            .options(
-                selectinload(InventoryItem.location),
-                selectinload(InventoryItem.stock_reports),
-            )
-            .where(InventoryItem.id == item_id)
+            _item_rows_query().where(InventoryItem.id == item_id)
         )
-        item = result.scalar_one_or_none()
-        if not item:
+        row = result.first()
+        if not row:
             raise HTTPException(status_code=404, detail="Item not found")
-        return _serialize_item(item)
+        return ORJSONResponse(_serialize_item_row(row))
+
+
+async def _regen_aliases(inventory_ai: InventoryAI, item_id: int, name: str, category: str):
+    """Generate AI search aliases for an item and store them (background task)."""
+    try:
+        aliases = await inventory_ai.generate_search_aliases(name, category)
+        if aliases:
+            async with get_session() as session:
+                await session.execute(
+                    update(InventoryItem)
+                    .where(InventoryItem.id == item_id)
+                    .values(search_aliases=", ".join(aliases))
+                )
+    except Exception as e:
+        logger.error("Alias generation failed for item %d (non-fatal): %s", item_id, e)
 
 
-@router.post("/inventory/items")
-async def create_inventory_item(req: ItemRequest, request: Request):
+@router.post("/inventory/items", dependencies=[Depends(require_owner)])
+async def create_inventory_item(
+    req: ItemRequest,
+    background_tasks: BackgroundTasks,
+    inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai),
+):
     """Create a new inventory item. Also generates AI search aliases."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
-        item = InventoryItem(
-            name=req.name,
-            category=req.category,
-            location_id=req.location_id,
-            quantity=req.quantity,
-            unit=req.unit,
-            min_quantity=req.min_quantity,
-            brand=req.brand,
-            purchase_url=req.purchase_url,
-            notes=req.notes,
-            status=req.status,
-            product_description=req.product_description,
-            usage_instructions=req.usage_instructions,
-            suitable_for=req.suitable_for,
+        result = await session.execute(
+            insert(InventoryItem).values(**req.model_dump()).returning(InventoryItem.id)
         )
-        session.add(item)
-        await session.flush()
-        item_id = item.id
+        item_id = result.scalar_one()
 
-    # Generate search aliases in background (non-blocking)
-    if _inventory_ai:
-        try:
-            aliases = await _inventory_ai.generate_search_aliases(req.name, req.category)
-            if aliases:
-                async with get_session() as session:
-                    result = await session.execute(
-                        select(InventoryItem).where(InventoryItem.id == item_id)
-                    )
-                    item = result.scalar_one_or_none()
-                    if item:
-                        item.search_aliases = ", ".join(aliases)
-        except Exception as e:
-            logger.error("Alias generation failed (non-fatal): %s", e)
+    # Generate search aliases after the response is sent (non-blocking)
+    if inventory_ai:
+        background_tasks.add_task(_regen_aliases, inventory_ai, item_id, req.name, req.category)
 
     return {"id": item_id, "created": True}
 
 
-@router.put("/inventory/items/{item_id}")
-async def update_inventory_item(item_id: int, req: ItemRequest, request: Request):
+@router.put("/inventory/items/{item_id}", dependencies=[Depends(require_owner)])
+async def update_inventory_item(
+    item_id: int,
+    req: ItemRequest,
+    background_tasks: BackgroundTasks,
+    inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai),
+):
     """Update an inventory item."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
+        # SET expressions see the pre-update row, so a rename clears the stale
+        # aliases in the same statement and RETURNING tells us to regenerate.
         result = await session.execute(
-            select(InventoryItem).where(InventoryItem.id == item_id)
+            update(InventoryItem)
+            .where(InventoryItem.id == item_id)
+            .values(
+                name=req.name,
+                category=req.category,
+                location_id=req.location_id,
+                quantity=req.quantity,
+                unit=req.unit,
+                min_quantity=req.min_quantity,
+                brand=req.brand,
+                purchase_url=req.purchase_url,
+                notes=req.notes,
+                status=req.status,
+                product_description=req.product_description,
+                usage_instructions=req.usage_instructions,
+                suitable_for=req.suitable_for,
+                search_aliases=case(
+                    (InventoryItem.name != req.name, None),
+                    else_=InventoryItem.search_aliases,
+                ),
+            )
+            .returning(InventoryItem.search_aliases)
         )
-        item = result.scalar_one_or_none()
-        if not item:
+        row = result.first()
+        if row is None:
             raise HTTPException(status_code=404, detail="Item not found")
+        needs_aliases = not row.search_aliases
 
-        old_name = item.name
-        item.name = req.name
-        item.category = req.category
-        item.location_id = req.location_id
-        item.quantity = req.quantity
-        item.unit = req.unit
-        item.min_quantity = req.min_quantity
-        item.brand = req.brand
-        item.purchase_url = req.purchase_url
-        item.notes = req.notes
-        item.status = req.status
-        item.product_description = req.product_description
-        item.usage_instructions = req.usage_instructions
-        item.suitable_for = req.suitable_for
-
-    # Regenerate aliases if name changed
-    if _inventory_ai and req.name != old_name:
-        try:
-            aliases = await _inventory_ai.generate_search_aliases(req.name, req.category)
-            if aliases:
-                async with get_session() as session:
-                    result = await session.execute(
-                        select(InventoryItem).where(InventoryItem.id == item_id)
-                    )
-                    item = result.scalar_one_or_none()
-                    if item:
-                        item.search_aliases = ", ".join(aliases)
-        except Exception as e:
-            logger.error("Alias regeneration failed (non-fatal): %s", e)
+    # Regenerate aliases if name changed (or none were ever generated)
+    if inventory_ai and needs_aliases:
+        background_tasks.add_task(_regen_aliases, inventory_ai, item_id, req.name, req.category)
 
     return {"id": item_id, "updated": True}
 
@@ -1425,35 +1546,31 @@ class MoveItemRequest(BaseModel):
     location_id: int
 
 
-@router.put("/inventory/items/{item_id}/move")
-async def move_inventory_item(item_id: int, req: MoveItemRequest, request: Request):
+@router.put("/inventory/items/{item_id}/move", dependencies=[Depends(require_owner)])
+async def move_inventory_item(item_id: int, req: MoveItemRequest):
     """Move an item to a new location."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
         result = await session.execute(
-            select(InventoryItem).where(InventoryItem.id == item_id)
+            update(InventoryItem)
+            .where(InventoryItem.id == item_id)
+            .values(location_id=req.location_id)
         )
-        item = result.scalar_one_or_none()
-        if not item:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Item not found")
-        item.location_id = req.location_id
         return {"id": item_id, "moved": True, "location_id": req.location_id}
 
 
-@router.delete("/inventory/items/{item_id}")
-async def delete_inventory_item(item_id: int, request: Request):
+@router.delete("/inventory/items/{item_id}", dependencies=[Depends(require_owner)])
+async def delete_inventory_item(item_id: int):
     """Soft-delete an inventory item."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
         result = await session.execute(
-            select(InventoryItem).where(InventoryItem.id == item_id)
+            update(InventoryItem)
+            .where(InventoryItem.id == item_id)
+            .values(active=False)
         )
-        item = result.scalar_one_or_none()
-        if not item:
+        if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Item not found")
-        item.active = False
         return {"id": item_id, "deleted": True}
 
 
@@ -1466,79 +1583,108 @@ class InventorySearchRequest(BaseModel):
     house_code: Optional[str] = None
 
 
+# Max items sent to the AI fallback (PostgreSQL only — ranked by trigram similarity)
+AI_SEARCH_CANDIDATES = 25
+
+# Must match the expression of the ix_inventory_items_search_trgm index (see init_db)
+_SEARCH_DOC = literal_column(
+    "lower(inventory_items.name) || ' ' || coalesce(lower(inventory_items.search_aliases), '')"
+)
+
+# SQLite FTS5 trigram lookup (see init_db); trigrams need queries of 3+ characters
+_SEARCH_FTS_IDS = text(
+    "SELECT rowid FROM inventory_items_fts WHERE inventory_items_fts MATCH :fts_query"
+).columns(column("rowid", Integer))
+
+
 @router.post("/inventory/search")
-async def search_inventory(req: InventorySearchRequest):
-    """Fuzzy search inventory items. Tier 1: DB LIKE search. Tier 2: AI fallback."""
+async def search_inventory(
+    req: InventorySearchRequest, inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai)
+):
+    """Fuzzy search inventory items. Tier 1: DB LIKE/trigram search. Tier 2: AI fallback."""
     query_lower = req.query.lower().strip()
     if not query_lower:
         return []
 
-    async with get_session() as session:
+    async with get_ro_session() as session:
         # Tier 1: DB search against name and search_aliases
         filters = [InventoryItem.active == True]
-        name_filter = or_(
-            func.lower(InventoryItem.name).contains(query_lower),
-            func.lower(InventoryItem.search_aliases).contains(query_lower),
-        )
-
-        query = (
-            select(InventoryItem)
-            .options(
-                selectinload(InventoryItem.location),
-                selectinload(InventoryItem.stock_reports),
+        if IS_POSTGRES:
+            # pg_trgm GIN index serves both the substring and word-similarity match
+            name_filter = or_(
+                _SEARCH_DOC.contains(query_lower),
+                literal(query_lower).op("<%")(_SEARCH_DOC),
             )
-            .where(and_(*filters, name_filter))
-        )
-        if req.house_code:
-            query = query.outerjoin(InventoryLocation).where(
-                InventoryLocation.house_code == req.house_code
+        elif SQLITE_SEARCH_FTS and len(query_lower) >= 3:
+            # Quoted as one phrase: a substring match on name or aliases
+            fts_query = '"' + query_lower.replace('"', '""') + '"'
+            name_filter = InventoryItem.id.in_(_SEARCH_FTS_IDS.bindparams(fts_query=fts_query))
+        else:
+            name_filter = or_(
+                func.lower(InventoryItem.name).contains(query_lower),
+                func.lower(InventoryItem.search_aliases).contains(query_lower),
             )
-        query = query.order_by(InventoryItem.name)
+
+        query = _item_rows_query().where(and_(*filters, name_filter))
+        if req.house_code:
+            query = query.where(InventoryLocation.house_code == req.house_code)
+        if IS_POSTGRES:
+            query = query.order_by(func.word_similarity(query_lower, _SEARCH_DOC).desc(), InventoryItem.name)
+        else:
+            query = query.order_by(InventoryItem.name)
         result = await session.execute(query)
-        items = result.scalars().unique().all()
+        rows = result.all()
 
-        if items:
-            return [_serialize_item(item) for item in items]
+        if rows:
+            return ORJSONResponse([_serialize_item_row(row) for row in rows])
 
         # Tier 2: AI fallback if no DB matches
-        if _inventory_ai:
-            all_result = await session.execute(
-                select(InventoryItem)
-                .options(selectinload(InventoryItem.location))
+        if inventory_ai:
+            candidates_query = (
+                select(
+                    InventoryItem.id,
+                    InventoryItem.name,
+                    InventoryItem.category,
+                    InventoryLocation.name.label("location_name"),
+                )
+                .outerjoin(InventoryLocation)
                 .where(InventoryItem.active == True)
             )
-            all_items = all_result.scalars().unique().all()
-            if not all_items:
+            if IS_POSTGRES:
+                candidates_query = candidates_query.order_by(
+                    func.word_similarity(query_lower, _SEARCH_DOC).desc()
+                ).limit(AI_SEARCH_CANDIDATES)
+            candidates = (await session.execute(candidates_query)).all()
+            if not candidates:
                 return []
 
             items_summary = [
                 {
-                    "id": i.id,
-                    "name": i.name,
-                    "category": i.category,
-                    "location_name": i.location.name if i.location else "unknown",
+                    "id": c.id,
+                    "name": c.name,
+                    "category": c.category,
+                    "location_name": c.location_name or "unknown",
                 }
-                for i in all_items
+                for c in candidates
             ]
-            matches = await _inventory_ai.fuzzy_search(req.query, items_summary)
+            matches = await inventory_ai.fuzzy_search(req.query, items_summary)
 
             # Fetch full item data for matches
             matched_ids = [m.get("item_id") for m in matches if m.get("item_id")]
             if matched_ids:
                 matched_result = await session.execute(
-                    select(InventoryItem)
-                    .options(
-                        selectinload(InventoryItem.location),
-                        selectinload(InventoryItem.stock_reports),
-                    )
-                    .where(InventoryItem.id.in_(matched_ids))
+                    _item_rows_query().where(InventoryItem.id.in_(matched_ids))
                 )
-                matched_items = {i.id: i for i in matched_result.scalars().unique().all()}
-                return [
-                    {**_serialize_item(matched_items[m["item_id"]]), "ai_match": True, "match_reason": m.get("reason", "")}
-                    for m in matches
-                    if m.get("item_id") in matched_items
-                ]
+                matched_items = {row.id: row for row in matched_result}
+
+                # Keep the AI's ranking; one dict probe per match
+                serialize = _serialize_item_row
+                out = []
+                for m in matches:
+                    row = matched_items.get(m.get("item_id"))
+                    if row is not None:
+                        out.append({**serialize(row), "ai_match": True, "match_reason": m.get("reason", "")})
+                return ORJSONResponse(out)
 
         return []
 
@@ -1547,45 +1693,53 @@ async def search_inventory(req: InventorySearchRequest):
 # Inventory — AI Parse & Suggest
 # ---------------------------------------------------------------------------
 
+# Immutable, whitespace-trimmed request bodies for the AI and report endpoints.
+_AI_REQUEST_CONFIG = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+
 class NLInputRequest(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     text: str
 
 
-@router.post("/inventory/ai/parse")
-async def ai_parse_inventory_input(req: NLInputRequest, request: Request):
+@router.post("/inventory/ai/parse", dependencies=[Depends(require_owner)])
+async def ai_parse_inventory_input(
+    req: NLInputRequest, inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai)
+):
     """Parse natural language input into structured inventory items."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
-    if not _inventory_ai:
+    if not inventory_ai:
         raise HTTPException(status_code=503, detail="Inventory AI not configured")
 
-    async with get_session() as session:
-        locations = await _get_locations_context(session)
+    locations = (await _get_locations_cached()).context
 
-    result = await _inventory_ai.parse_natural_language_input(req.text, locations)
+    result = await inventory_ai.parse_natural_language_input(req.text, locations)
     return result
 
 
 class BulkImportRequest(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     text: str
 
 
-@router.post("/inventory/ai/bulk-import")
-async def ai_bulk_import_preview(req: BulkImportRequest, request: Request):
+@router.post("/inventory/ai/bulk-import", dependencies=[Depends(require_owner)])
+async def ai_bulk_import_preview(
+    req: BulkImportRequest, inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai)
+):
     """Parse a text dump into structured items (preview — does not save)."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
-    if not _inventory_ai:
+    if not inventory_ai:
         raise HTTPException(status_code=503, detail="Inventory AI not configured")
 
-    async with get_session() as session:
-        locations = await _get_locations_context(session)
+    locations = (await _get_locations_cached()).context
 
-    result = await _inventory_ai.parse_bulk_import(req.text, locations)
+    result = await inventory_ai.parse_bulk_import(req.text, locations)
     return result
 
 
 class BulkImportConfirmItem(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     name: str
     category: str
     location_code: Optional[str] = None
@@ -1594,94 +1748,121 @@ class BulkImportConfirmItem(BaseModel):
 
 
 class BulkImportConfirmRequest(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     items: list[BulkImportConfirmItem]
 
 
-@router.post("/inventory/ai/bulk-import/confirm")
-async def ai_bulk_import_confirm(req: BulkImportConfirmRequest, request: Request):
+# Above this many rows (PostgreSQL only), confirm uses binary COPY instead of executemany
+BULK_COPY_THRESHOLD = 100
+
+
+async def _copy_items(session, rows: list[dict]) -> list[tuple[int, str, str]]:
+    """Insert item rows via asyncpg's binary COPY. Returns (id, name, category) per row.
+
+    COPY can't RETURNING and skips SQLAlchemy's Python-side defaults, so ids are
+    reserved from the sequence up front and defaulted columns are filled in here.
+    """
+    id_result = await session.execute(
+        select(func.nextval("inventory_items_id_seq"))
+        .select_from(func.generate_series(1, len(rows)))
+    )
+    ids = id_result.scalars().all()
+
+    now = datetime.utcnow()
+    records = [
+        (item_id, r["name"], r["category"], r["location_id"], r["quantity"], r["unit"],
+         0, "in_use", True, now, now)
+        for item_id, r in zip(ids, rows)
+    ]
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "inventory_items",
+        records=records,
+        columns=[
+            "id", "name", "category", "location_id", "quantity", "unit",
+            "min_quantity", "status", "active", "created_at", "updated_at",
+        ],
+    )
+    return [(item_id, r["name"], r["category"]) for item_id, r in zip(ids, rows)]
+
+
+@router.post("/inventory/ai/bulk-import/confirm", dependencies=[Depends(require_owner)])
+async def ai_bulk_import_confirm(
+    req: BulkImportConfirmRequest, inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai)
+):
     """Confirm and save bulk import items to database."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
 
-    created = 0
-    async with get_session() as session:
-        # Build code-to-id map
-        loc_result = await session.execute(
-            select(InventoryLocation).where(InventoryLocation.active == True)
-        )
-        code_to_id = {
-            loc.code: loc.id for loc in loc_result.scalars().all() if loc.code
-        }
+    if not req.items:
+        return {"created": 0}
+
+    code_to_id = (await _get_locations_cached()).code_to_id
 
-        for item_data in req.items:
-            location_id = code_to_id.get(item_data.location_code)
-            item = InventoryItem(
-                name=item_data.name,
-                category=item_data.category,
-                location_id=location_id,
-                quantity=item_data.quantity,
-                unit=item_data.unit,
+    async with get_session() as session:
+        rows = [
+            {
+                "name": item_data.name,
+                "category": item_data.category,
+                "location_id": code_to_id.get(item_data.location_code),
+                "quantity": item_data.quantity,
+                "unit": item_data.unit,
+            }
+            for item_data in req.items
+        ]
+        if IS_POSTGRES and len(rows) >= BULK_COPY_THRESHOLD:
+            inserted = await _copy_items(session, rows)
+        else:
+            result = await session.execute(
+                insert(InventoryItem).returning(
+                    InventoryItem.id, InventoryItem.name, InventoryItem.category
+                ),
+                rows,
             )
-            session.add(item)
-            created += 1
-        await session.flush()
+            inserted = result.all()
 
-    # Generate search aliases for all new items (fire-and-forget style)
-    if _inventory_ai:
-        for item_data in req.items:
-            try:
-                aliases = await _inventory_ai.generate_search_aliases(item_data.name, item_data.category)
-                if aliases:
-                    async with get_session() as session:
-                        result = await session.execute(
-                            select(InventoryItem).where(
-                                and_(
-                                    InventoryItem.name == item_data.name,
-                                    InventoryItem.active == True,
-                                )
-                            )
-                        )
-                        item = result.scalar_one_or_none()
-                        if item and not item.search_aliases:
-                            item.search_aliases = ", ".join(aliases)
-            except Exception as e:
-                logger.error("Alias generation failed for %s (non-fatal): %s", item_data.name, e)
-
-    return {"created": created}
+    # Generate search aliases for all new items in batched calls, then store them in one executemany
+    if inventory_ai:
+        alias_lists = await inventory_ai.generate_search_aliases_batch(
+            [(name, category) for _, name, category in inserted]
+        )
+        alias_rows = [
+            {"id": item_id, "search_aliases": ", ".join(aliases)}
+            for (item_id, _, _), aliases in zip(inserted, alias_lists)
+            if aliases
+        ]
+        if alias_rows:
+            async with get_session() as session:
+                await session.execute(update(InventoryItem), alias_rows)
+
+    return {"created": len(inserted)}
 
 
 class SuggestLocationRequest(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     item_name: str
     category: str
 
 
-@router.post("/inventory/ai/suggest-location")
-async def ai_suggest_location(req: SuggestLocationRequest, request: Request):
+@router.post("/inventory/ai/suggest-location", dependencies=[Depends(require_owner)])
+async def ai_suggest_location(
+    req: SuggestLocationRequest, inventory_ai: Optional[InventoryAI] = Depends(get_inventory_ai)
+):
     """Get AI suggestions for where to store an item."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
-    if not _inventory_ai:
+    if not inventory_ai:
         raise HTTPException(status_code=503, detail="Inventory AI not configured")
 
-    async with get_session() as session:
-        locations = await _get_locations_context(session)
+    locations = await _get_locations_cached()
 
-    suggestions = await _inventory_ai.suggest_location(req.item_name, req.category, locations)
+    suggestions = await inventory_ai.suggest_location(req.item_name, req.category, locations.context)
 
     # Enrich suggestions with location IDs
-    async with get_session() as session:
-        loc_result = await session.execute(
-            select(InventoryLocation).where(InventoryLocation.active == True)
-        )
-        code_to_loc = {
-            loc.code: {"id": loc.id, "name": loc.name, "house_code": loc.house_code}
-            for loc in loc_result.scalars().all() if loc.code
-        }
-        for s in suggestions:
-            loc_info = code_to_loc.get(s.get("location_code"))
-            if loc_info:
-                s["location_id"] = loc_info["id"]
-                s["house_code"] = loc_info["house_code"]
+    for s in suggestions:
+        loc_info = locations.code_to_loc.get(s.get("location_code"))
+        if loc_info:
+            s["location_id"] = loc_info["id"]
+            s["house_code"] = loc_info["house_code"]
 
     return {"suggestions": suggestions}
 
@@ -1691,13 +1872,17 @@ async def ai_suggest_location(req: SuggestLocationRequest, request: Request):
 # ---------------------------------------------------------------------------
 
 class StockReportRequest(BaseModel):
+    model_config = _AI_REQUEST_CONFIG
+
     item_id: int
     report_type: str  # "low" or "missing"
     notes: Optional[str] = None
 
 
 @router.post("/inventory/reports")
-async def create_stock_report(req: StockReportRequest, request: Request):
+async def create_stock_report(
+    req: StockReportRequest, request: Request, background_tasks: BackgroundTasks
+):
     """Create a stock report (any role can report)."""
     role = getattr(request.state, "role", "cleaner")
 
@@ -1726,64 +1911,81 @@ async def create_stock_report(req: StockReportRequest, request: Request):
         item_name = item.name
         location_name = item.location.name if item.location else ""
 
-    # Send ntfy notification to Pierre
+    # Send ntfy notification to Pierre once the response is out (send() never raises)
     if _ntfy and _ntfy.configured:
         if req.report_type == "missing":
-            await _ntfy.send(
+            background_tasks.add_task(
+                _ntfy.send,
                 title="🚫 Out of Stock",
                 message=f"{item_name}" + (f" ({location_name})" if location_name else ""),
                 priority=4,
                 tags=["x"],
             )
         else:
-            await _ntfy.notify_running_low(item_name, location_name)
+            background_tasks.add_task(_ntfy.notify_running_low, item_name, location_name)
 
     return {"id": report_id, "created": True}
 
 
+# Rows fetched per round-trip when streaming stock reports
+REPORTS_STREAM_BATCH = 200
+
+
 @router.get("/inventory/reports")
 async def get_stock_reports(
     resolved: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1),
     request: Request = None,
 ):
-    """Get stock reports. Default: unresolved only."""
-    async with get_session() as session:
-        query = (
-            select(StockReport)
-            .options(selectinload(StockReport.item).selectinload(InventoryItem.location))
-            .order_by(StockReport.created_at.desc())
+    """Get stock reports. Default: unresolved only.
+
+    With `limit`, returns a plain JSON list; otherwise rows are streamed out
+    as a JSON array so long resolved histories are never held in memory.
+    """
+    query = (
+        select(
+            StockReport.id,
+            StockReport.item_id,
+            InventoryItem.name.label("item_name"),
+            InventoryItem.category.label("item_category"),
+            InventoryLocation.name.label("location_name"),
+            InventoryLocation.house_code,
+            StockReport.report_type,
+            StockReport.reported_by,
+            StockReport.notes,
+            StockReport.resolved,
+            StockReport.resolved_at,
+            StockReport.created_at,
         )
-        if resolved is not None:
-            query = query.where(StockReport.resolved == resolved)
-        else:
-            query = query.where(StockReport.resolved == False)
+        .outerjoin(InventoryItem, StockReport.item_id == InventoryItem.id)
+        .outerjoin(InventoryLocation, InventoryItem.location_id == InventoryLocation.id)
+        .where(StockReport.resolved == (resolved if resolved is not None else False))
+        .order_by(StockReport.created_at.desc())
+    )
 
-        result = await session.execute(query)
-        reports = result.scalars().all()
-        return [
-            {
-                "id": r.id,
-                "item_id": r.item_id,
-                "item_name": r.item.name if r.item else None,
-                "item_category": r.item.category if r.item else None,
-                "location_name": r.item.location.name if r.item and r.item.location else None,
-                "house_code": r.item.location.house_code if r.item and r.item.location else None,
-                "report_type": r.report_type,
-                "reported_by": r.reported_by,
-                "notes": r.notes,
-                "resolved": r.resolved,
-                "resolved_at": r.resolved_at.isoformat() if r.resolved_at else None,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
-            }
-            for r in reports
-        ]
+    if limit is not None:
+        async with get_ro_session() as session:
+            result = await session.execute(query.limit(limit))
+            return ORJSONResponse([dict(row) for row in result.mappings()])
+
+    async def stream_reports():
+        yield b"["
+        separator = b""
+        async with get_ro_session() as session:
+            result = await session.stream(
+                query.execution_options(yield_per=REPORTS_STREAM_BATCH)
+            )
+            async for row in result.mappings():
+                yield separator + orjson.dumps(dict(row))
+                separator = b","
+        yield b"]"
+
+    return StreamingResponse(stream_reports(), media_type="application/json")
 
 
-@router.put("/inventory/reports/{report_id}/resolve")
-async def resolve_stock_report(report_id: int, request: Request):
+@router.put("/inventory/reports/{report_id}/resolve", dependencies=[Depends(require_owner)])
+async def resolve_stock_report(report_id: int):
     """Mark a stock report as resolved."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
     async with get_session() as session:
         result = await session.execute(
             select(StockReport).where(StockReport.id == report_id)
@@ -1796,43 +1998,52 @@ async def resolve_stock_report(report_id: int, request: Request):
         return {"id": report_id, "resolved": True}
 
 
-@router.get("/inventory/shopping-list")
-async def get_shopping_list(request: Request):
+@router.get("/inventory/shopping-list", dependencies=[Depends(require_owner)])
+async def get_shopping_list():
     """Get aggregated shopping list from unresolved stock reports."""
-    if request.state.role != "owner":
-        raise HTTPException(status_code=403, detail="Owner access required")
-    async with get_session() as session:
+    # Aggregate by item in SQL (multiple reports for same item → one shopping list entry)
+    has_missing = func.max(case((StockReport.report_type == "missing", 1), else_=0))
+    item_name = func.coalesce(InventoryItem.name, "Unknown")
+    report_ids = (
+        func.array_agg(StockReport.id) if IS_POSTGRES else func.group_concat(StockReport.id)
+    )
+    async with get_ro_session() as session:
         result = await session.execute(
-            select(StockReport)
-            .options(selectinload(StockReport.item).selectinload(InventoryItem.location))
+            select(
+                StockReport.item_id,
+                item_name.label("name"),
+                InventoryItem.category,
+                InventoryItem.brand,
+                InventoryItem.purchase_url,
+                InventoryLocation.house_code,
+                InventoryLocation.name.label("location_name"),
+                func.count(StockReport.id).label("report_count"),
+                func.max(StockReport.created_at).label("latest_report"),
+                has_missing.label("has_missing"),
+                report_ids.label("report_ids"),
+            )
+            .outerjoin(InventoryItem, StockReport.item_id == InventoryItem.id)
+            .outerjoin(InventoryLocation, InventoryItem.location_id == InventoryLocation.id)
             .where(StockReport.resolved == False)
-            .order_by(StockReport.created_at.asc())
+            .group_by(StockReport.item_id, InventoryItem.id, InventoryLocation.id)
+            .order_by(has_missing.desc(), item_name)
         )
-        reports = result.scalars().all()
-
-        # Aggregate by item (multiple reports for same item → one shopping list entry)
-        seen_items = {}
-        for r in reports:
-            if r.item_id not in seen_items:
-                seen_items[r.item_id] = {
-                    "item_id": r.item_id,
-                    "name": r.item.name if r.item else "Unknown",
-                    "category": r.item.category if r.item else None,
-                    "brand": r.item.brand if r.item else None,
-                    "purchase_url": r.item.purchase_url if r.item else None,
-                    "house_code": r.item.location.house_code if r.item and r.item.location else None,
-                    "location_name": r.item.location.name if r.item and r.item.location else None,
-                    "report_count": 0,
-                    "latest_report": None,
-                    "worst_status": "low",
-                    "report_ids": [],
-                }
-            entry = seen_items[r.item_id]
-            entry["report_count"] += 1
-            entry["report_ids"].append(r.id)
-            if r.created_at:
-                entry["latest_report"] = r.created_at.isoformat()
-            if r.report_type == "missing":
-                entry["worst_status"] = "missing"
-
-        return sorted(seen_items.values(), key=lambda x: (0 if x["worst_status"] == "missing" else 1, x["name"]))
+        return ORJSONResponse([
+            {
+                "item_id": row.item_id,
+                "name": row.name,
+                "category": row.category,
+                "brand": row.brand,
+                "purchase_url": row.purchase_url,
+                "house_code": row.house_code,
+                "location_name": row.location_name,
+                "report_count": row.report_count,
+                "latest_report": row.latest_report,
+                "worst_status": "missing" if row.has_missing else "low",
+                # Report ids ascend with creation order; group_concat comes back as "1,2,3"
+                "report_ids": sorted(
+                    row.report_ids if IS_POSTGRES else map(int, row.report_ids.split(","))
+                ),
+            }
+            for row in result
+        ])
@@ -3,11 +3,12 @@
 import hashlib
 import hmac
 import time
-from collections import defaultdict
+from collections import deque
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import HTTPException, Request
+from starlette.requests import cookie_parser
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.config import settings
 
@@ -17,7 +18,12 @@ COOKIE_MAX_AGE = 30 * 24 * 3600  # 30 days
 # Rate limiting: max 5 failed attempts per IP, then locked for 15 minutes
 MAX_ATTEMPTS = 5
 LOCKOUT_SECONDS = 15 * 60
-_failed_attempts: dict[str, list[float]] = defaultdict(list)
+# Per-IP timestamps of recent failures, oldest first (only the last MAX_ATTEMPTS matter)
+_failed_attempts: dict[str, deque[float]] = {}
+# Sweep idle IPs once the table grows past this many entries
+_PRUNE_THRESHOLD = 1024
+
+VALID_ROLES = frozenset({"owner", "cleaner"})
 
 # Paths that don't require authentication
 PUBLIC_PATHS = {"/api/health", "/api/auth/login", "/api/auth/check"}
@@ -26,18 +32,33 @@ PUBLIC_PREFIXES = ("/api/webhooks/",)
 
 def check_rate_limit(ip: str) -> int | None:
     """Check if IP is rate-limited. Returns seconds until unlock, or None if OK."""
+    attempts = _failed_attempts.get(ip)
+    if not attempts:
+        return None
     now = time.time()
-    # Clean old attempts
-    _failed_attempts[ip] = [t for t in _failed_attempts[ip] if now - t < LOCKOUT_SECONDS]
-    if len(_failed_attempts[ip]) >= MAX_ATTEMPTS:
-        oldest = _failed_attempts[ip][0]
-        return int(LOCKOUT_SECONDS - (now - oldest))
+    # Drop expired attempts from the old end
+    while attempts and now - attempts[0] >= LOCKOUT_SECONDS:
+        attempts.popleft()
+    if len(attempts) >= MAX_ATTEMPTS:
+        return int(LOCKOUT_SECONDS - (now - attempts[0]))
     return None
 
 
 def record_failed_attempt(ip: str):
     """Record a failed login attempt."""
-    _failed_attempts[ip].append(time.time())
+    attempts = _failed_attempts.get(ip)
+    if attempts is None:
+        if len(_failed_attempts) >= _PRUNE_THRESHOLD:
+            prune_failed_attempts()
+        attempts = _failed_attempts[ip] = deque(maxlen=MAX_ATTEMPTS)
+    attempts.append(time.time())
+
+
+def prune_failed_attempts():
+    """Forget IPs whose most recent failure is older than the lockout window."""
+    cutoff = time.time() - LOCKOUT_SECONDS
+    for ip in [ip for ip, attempts in _failed_attempts.items() if not attempts or attempts[-1] < cutoff]:
+        del _failed_attempts[ip]
 
 
 def clear_attempts(ip: str):
@@ -45,11 +66,15 @@ def clear_attempts(ip: str):
     _failed_attempts.pop(ip, None)
 
 
+# Keyed once at import; _sign copies it instead of re-deriving the padded key per call
+_HMAC_PROTOTYPE = hmac.new(settings.secret_key.encode(), digestmod=hashlib.sha256)
+
+
 def _sign(value: str) -> str:
     """Create HMAC signature for a cookie value."""
-    return hmac.new(
-        settings.secret_key.encode(), value.encode(), hashlib.sha256
-    ).hexdigest()[:16]
+    h = _HMAC_PROTOTYPE.copy()
+    h.update(value.encode())
+    return h.hexdigest()[:16]
 
 
 def create_session_cookie(role: str) -> str:
@@ -62,13 +87,12 @@ def create_session_cookie(role: str) -> str:
 
 def verify_session_cookie(cookie: str) -> str | None:
     """Verify a signed session cookie. Returns role or None."""
-    parts = cookie.split(":")
-    if len(parts) != 3:
-        return None
-    role, ts, sig = parts
-    if role not in ("owner", "cleaner"):
+    # Fixed role:ts:sig layout — rpartition avoids split()'s list allocation
+    payload, _, sig = cookie.rpartition(":")
+    role, _, ts = payload.rpartition(":")
+    if role not in VALID_ROLES:
         return None
-    expected = _sign(f"{role}:{ts}")
+    expected = _sign(payload)
     if not hmac.compare_digest(sig, expected):
         return None
     # Check expiry
@@ -81,32 +105,51 @@ def verify_session_cookie(cookie: str) -> str | None:
     return role
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Require valid session cookie for protected API routes."""
+def require_owner(request: Request) -> str:
+    """Route dependency: reject anyone but the owner with 403."""
+    role = getattr(request.state, "role", None)
+    if role != "owner":
+        raise HTTPException(status_code=403, detail="Owner access required")
+    return role
+
+
+class AuthMiddleware:
+    """Require valid session cookie for protected API routes.
+
+    Plain ASGI middleware — BaseHTTPMiddleware would wrap every request in a
+    task group and memory streams just to read one cookie.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+        path = scope["path"]
 
         # Static files and frontend — no auth needed
         if not path.startswith("/api/"):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         # Public API paths
-        if path in PUBLIC_PATHS:
-            return await call_next(request)
-        for prefix in PUBLIC_PREFIXES:
-            if path.startswith(prefix):
-                return await call_next(request)
+        if path in PUBLIC_PATHS or path.startswith(PUBLIC_PREFIXES):
+            return await self.app(scope, receive, send)
 
         # Check session cookie
-        cookie = request.cookies.get(COOKIE_NAME)
+        cookie = None
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie = cookie_parser(value.decode("latin-1")).get(COOKIE_NAME)
+                break
         if not cookie:
-            return JSONResponse({"detail": "Not authenticated"}, status_code=401)
+            return await JSONResponse({"detail": "Not authenticated"}, status_code=401)(scope, receive, send)
 
         role = verify_session_cookie(cookie)
         if not role:
-            return JSONResponse({"detail": "Session expired"}, status_code=401)
+            return await JSONResponse({"detail": "Session expired"}, status_code=401)(scope, receive, send)
 
-        # Attach role to request state
-        request.state.role = role
-        return await call_next(request)
+        # Attach role to request state (read back as request.state.role)
+        scope.setdefault("state", {})["role"] = role
+        await self.app(scope, receive, send)
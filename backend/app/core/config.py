@@ -33,6 +33,7 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = True
+    sql_echo: bool = False  # Log every SQL statement (separate from debug — it's costly)
     base_url: str = "http://localhost:8000"  # Public URL for webhooks
 
     # AI Settings
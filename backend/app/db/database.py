@@ -1,21 +1,84 @@
 """Database connection and session management."""
 
 import logging
+import sqlite3
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from sqlalchemy import event, inspect, make_url, text, update
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
-from app.db.models import Base
+from app.db.models import Base, KnowledgeEntry
 
 logger = logging.getLogger(__name__)
 
+IS_POSTGRES = make_url(settings.database_url).get_backend_name() == "postgresql"
+
+# SQLite search index: FTS5 with the trigram tokenizer (SQLite 3.34+) gives
+# indexed substring matching over item names and aliases
+SQLITE_SEARCH_FTS = not IS_POSTGRES and sqlite3.sqlite_version_info >= (3, 34, 0)
+
+_SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE inventory_items_fts USING fts5("
+    "name, search_aliases, content='inventory_items', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS inventory_items_fts_ai AFTER INSERT ON inventory_items BEGIN "
+    "INSERT INTO inventory_items_fts(rowid, name, search_aliases) "
+    "VALUES (new.id, new.name, new.search_aliases); END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_items_fts_ad AFTER DELETE ON inventory_items BEGIN "
+    "INSERT INTO inventory_items_fts(inventory_items_fts, rowid, name, search_aliases) "
+    "VALUES ('delete', old.id, old.name, old.search_aliases); END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_items_fts_au AFTER UPDATE OF name, search_aliases "
+    "ON inventory_items BEGIN "
+    "INSERT INTO inventory_items_fts(inventory_items_fts, rowid, name, search_aliases) "
+    "VALUES ('delete', old.id, old.name, old.search_aliases); "
+    "INSERT INTO inventory_items_fts(rowid, name, search_aliases) "
+    "VALUES (new.id, new.name, new.search_aliases); END",
+    # Index the rows that existed before the table did
+    "INSERT INTO inventory_items_fts(inventory_items_fts) VALUES ('rebuild')",
+)
+
+# Pool tuning only applies to PostgreSQL — SQLite connections are local file handles
+_engine_options = {}
+if IS_POSTGRES:
+    _engine_options = {
+        "pool_size": 25,
+        "max_overflow": 50,
+        "pool_pre_ping": False,  # asyncpg detects dead connections itself
+        "pool_recycle": 1800,
+        "pool_use_lifo": True,  # reuse the hottest connections, let idle ones age out
+        "connect_args": {
+            "statement_cache_size": 1024,  # prepared-statement reuse per connection
+            "server_settings": {"jit": "off"},  # JIT only hurts short OLTP queries
+        },
+    }
+
 engine = create_async_engine(
     settings.database_url,
-    echo=settings.debug,
+    echo=settings.sql_echo,
+    # Compiled-SQL cache; optional-filter endpoints add a few dozen variants each
+    query_cache_size=2000,
+    **_engine_options,
+)
+
+# Per-connection SQLite tuning: WAL lets readers run alongside the writer, and
+# NORMAL sync is durable under WAL apart from the last commit on power loss
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped reads
 )
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -23,10 +86,60 @@ async_session_maker = async_sessionmaker(
 )
 
 
+def _add_missing_columns(sync_conn) -> None:
+    """create_all skips tables that already exist, so add any nullable columns declared since."""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning("Cannot auto-add NOT NULL column %s.%s", table.name, column.name)
+                continue
+            col_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+            logger.info("Added column %s.%s", table.name, column.name)
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """create_all skips tables that already exist, so add any indexes declared since."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db() -> None:
     """Initialize the database, creating all tables."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+        # Backfill house_scope for entries written before the column existed
+        for house in ("193", "195"):
+            await conn.execute(
+                update(KnowledgeEntry)
+                .where(
+                    KnowledgeEntry.house_scope.is_(None),
+                    KnowledgeEntry.answer.ilike(f"%[{house} only]%"),
+                )
+                .values(house_scope=house)
+            )
+        if IS_POSTGRES:
+            # Trigram index backing /inventory/search (expression must match routes._SEARCH_DOC)
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_inventory_items_search_trgm ON inventory_items "
+                "USING gin ((lower(name) || ' ' || coalesce(lower(search_aliases), '')) gin_trgm_ops)"
+            ))
+        if SQLITE_SEARCH_FTS:
+            # Search index backing /inventory/search (see routes.search_inventory)
+            exists = await conn.scalar(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inventory_items_fts'"
+            ))
+            if not exists:
+                for statement in _SQLITE_FTS_DDL:
+                    await conn.execute(text(statement))
     logger.info("Database initialized")
 
 
@@ -40,3 +153,10 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         except Exception:
             await session.rollback()
             raise
+
+
+@asynccontextmanager
+async def get_ro_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get a session for read-only work — no COMMIT round-trip on exit."""
+    async with async_session_maker() as session:
+        yield session
@@ -8,11 +8,14 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
+    text,
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, validates
 
 
 class Base(DeclarativeBase):
@@ -52,17 +55,20 @@ class Reservation(Base):
     guest_email: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     guest_phone: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     guest_picture_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    check_in: Mapped[datetime] = mapped_column(DateTime)
-    check_out: Mapped[datetime] = mapped_column(DateTime)
+    # Indexed for the scheduler's per-day windows and the list endpoints' date filters
+    check_in: Mapped[datetime] = mapped_column(DateTime, index=True)
+    check_out: Mapped[datetime] = mapped_column(DateTime, index=True)
     num_guests: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     platform: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
     status: Mapped[str] = mapped_column(String(50), default="confirmed")
     raw_data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     last_synced: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
-    listing: Mapped["Listing"] = relationship("Listing", back_populates="reservations")
+    # lazy="raise": async sessions can't lazy-load anyway, and an implicit load
+    # here is an N+1 — callers opt in with selectinload/joinedload
+    listing: Mapped["Listing"] = relationship("Listing", back_populates="reservations", lazy="raise")
     messages: Mapped[list["Message"]] = relationship(
-        "Message", back_populates="reservation", order_by="Message.timestamp"
+        "Message", back_populates="reservation", order_by="Message.timestamp", lazy="raise"
     )
 
 
@@ -74,11 +80,20 @@ class Message(Base):
     """A message in a guest conversation."""
 
     __tablename__ = "messages"
+    __table_args__ = (
+        # Conversation history (drafts, thread view): walks one reservation's
+        # sent, non-template messages in timestamp order without a sort step.
+        # Also covers plain reservation_id lookups via its prefix.
+        Index("ix_messages_convo", "reservation_id", "is_template", "is_draft", "timestamp"),
+        # Template detection: host messages not yet fingerprinted (IS NULL),
+        # and every message sharing a fingerprint that just became a template
+        Index("ix_messages_template_fp", "template_fp"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    reservation_id: Mapped[int] = mapped_column(ForeignKey("reservations.id"), index=True)
+    reservation_id: Mapped[int] = mapped_column(ForeignKey("reservations.id"))
     hosttools_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, unique=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # Who sent it: guest, host, ai, system/template
     sender: Mapped[str] = mapped_column(String(20))
@@ -105,28 +120,61 @@ class Message(Base):
 
     # Template detection
     is_template: Mapped[bool] = mapped_column(Boolean, default=False)
+    template_fp: Mapped[Optional[bytes]] = mapped_column(LargeBinary(8), nullable=True)  # host messages
 
     reservation: Mapped["Reservation"] = relationship("Reservation", back_populates="messages")
 
 
+class TemplateFingerprint(Base):
+    """How many host messages share a normalized body — 3+ makes them templates."""
+
+    __tablename__ = "template_fingerprints"
+
+    fingerprint: Mapped[bytes] = mapped_column(LargeBinary(8), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
 # ---------------------------------------------------------------------------
 # Knowledge base
 # ---------------------------------------------------------------------------
 
+def knowledge_house_scope(answer: Optional[str]) -> Optional[str]:
+    """House an answer is tagged for ("[193 only]" / "[195 only]"), or None if it applies to both."""
+    lower = (answer or "").lower()
+    if "[193 only]" in lower:
+        return "193"
+    if "[195 only]" in lower:
+        return "195"
+    return None
+
+
 class KnowledgeEntry(Base):
     """Knowledge base entry — injected into Claude's system prompt."""
 
     __tablename__ = "knowledge_entries"
+    __table_args__ = (
+        # Draft generation: active entries for one house (house_scope NULL = both)
+        Index("ix_knowledge_entries_active_house_scope", "active", "house_scope"),
+        # Learned-entry dedup: point lookup by category + reply fingerprint
+        Index("ix_knowledge_entries_category_fingerprint", "category", "fingerprint"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     category: Mapped[str] = mapped_column(String(100), index=True)
     question: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     answer: Mapped[str] = mapped_column(Text)
+    house_scope: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)  # derived from answer tags
     source: Mapped[str] = mapped_column(String(50), default="manual")  # manual, learned, imported
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(24), nullable=True)  # learned entries only
     active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    @validates("answer")
+    def _sync_house_scope(self, key, answer):
+        self.house_scope = knowledge_house_scope(answer)
+        return answer
+
 
 # ---------------------------------------------------------------------------
 # AI auto-reply category tracking
@@ -171,9 +219,14 @@ class ScheduledMessageLog(Base):
     """Log of sent scheduled messages — prevents duplicates."""
 
     __tablename__ = "scheduled_message_log"
+    __table_args__ = (
+        # At most one send per template and reservation; the scheduler claims a
+        # row with INSERT ... ON CONFLICT DO NOTHING before sending
+        Index("ix_scheduled_message_log_template_reservation", "template_id", "reservation_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    template_id: Mapped[int] = mapped_column(ForeignKey("message_templates.id"), index=True)
+    template_id: Mapped[int] = mapped_column(ForeignKey("message_templates.id"))
     reservation_id: Mapped[int] = mapped_column(ForeignKey("reservations.id"), index=True)
     sent_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     body_sent: Mapped[str] = mapped_column(Text)  # actual body after placeholder substitution
@@ -219,6 +272,19 @@ class InventoryItem(Base):
     """An inventory item tracked across properties."""
 
     __tablename__ = "inventory_items"
+    __table_args__ = (
+        # /inventory/items filters (active + category) and sorts by name
+        Index("ix_inventory_items_active_category_name", "active", "category", "name"),
+        # Alias regeneration / bulk import look items up by name among active rows
+        Index("ix_inventory_items_active_name", "active", "name"),
+        # Low-stock filter / shopping list — only the handful of rows below threshold
+        Index(
+            "ix_inventory_items_low_stock",
+            "active",
+            postgresql_where=text("min_quantity > 0 AND quantity <= min_quantity"),
+            sqlite_where=text("min_quantity > 0 AND quantity <= min_quantity"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), index=True)
@@ -264,9 +330,22 @@ class StockReport(Base):
     """A stock report from a cleaner — item running low or missing."""
 
     __tablename__ = "stock_reports"
+    __table_args__ = (
+        # /inventory/reports?resolved=... ordered by created_at
+        Index("ix_stock_reports_resolved_created", "resolved", "created_at"),
+        # Open reports (listing + shopping list) — a small, always-hot working set
+        Index(
+            "ix_stock_reports_unresolved",
+            "created_at",
+            postgresql_where=text("resolved = false"),
+            sqlite_where=text("resolved = 0"),
+        ),
+        # Per-item report history (InventoryItem.stock_reports order); prefix serves item_id lookups
+        Index("ix_stock_reports_item_created", "item_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    item_id: Mapped[int] = mapped_column(ForeignKey("inventory_items.id"), index=True)
+    item_id: Mapped[int] = mapped_column(ForeignKey("inventory_items.id"))
     report_type: Mapped[str] = mapped_column(String(20))  # "low", "missing"
     reported_by: Mapped[str] = mapped_column(String(50), default="cleaner")  # role who reported
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
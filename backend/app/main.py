@@ -7,6 +7,7 @@ from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
@@ -14,9 +15,9 @@ from app.api.routes import router as api_router, set_services
 from app.core.auth import AuthMiddleware
 from app.core.config import settings
 from app.db.database import init_db
-from app.services.ai_drafter import AIDrafter
+from app.services.ai_drafter import close_drafter, get_drafter
 from app.services.hosttools import HostToolsClient
-from app.services.inventory_ai import InventoryAI
+from app.services.inventory_ai import close_inventory_ai, get_inventory_ai
 from app.services.ntfy import NtfyClient
 
 # Paths — works both locally (backend/app/main.py → ../../frontend)
@@ -40,43 +41,51 @@ hosttools: HostToolsClient | None = None
 ntfy: NtfyClient | None = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Application lifespan — startup and shutdown."""
-    global hosttools, ntfy
-
-    logger.info("Starting VBR Platform...")
-
-    # Init database
-    await init_db()
-
-    # Init Host Tools client
-    if settings.hosttools_auth_token:
-        hosttools = HostToolsClient(settings.hosttools_auth_token)
-        logger.info("Host Tools API client initialized")
-    else:
+async def _init_hosttools() -> HostToolsClient | None:
+    if not settings.hosttools_auth_token:
         logger.warning("HOSTTOOLS_AUTH_TOKEN not set — API calls will fail")
+        return None
+    client = HostToolsClient(settings.hosttools_auth_token)
+    logger.info("Host Tools API client initialized")
+    return client
 
-    # Init ntfy client
-    ntfy = NtfyClient(settings.ntfy_url, settings.ntfy_topic, settings.ntfy_token)
-    if ntfy.configured:
+
+async def _init_ntfy() -> NtfyClient:
+    client = NtfyClient(settings.ntfy_url, settings.ntfy_topic, settings.ntfy_token)
+    if client.configured:
         logger.info("ntfy notifications initialized (%s/%s)", settings.ntfy_url, settings.ntfy_topic)
     else:
         logger.warning("ntfy not configured — notifications disabled")
+    return client
 
-    # Init AI drafter
-    ai_drafter = None
-    inventory_ai = None
-    if settings.gemini_api_key:
-        ai_drafter = AIDrafter(settings.gemini_api_key)
-        logger.info("AI Drafter initialized (model: gemini-2.0-flash)")
-        inventory_ai = InventoryAI(settings.gemini_api_key)
-        logger.info("Inventory AI initialized (model: gemini-2.0-flash)")
-    else:
+
+async def _init_ai() -> None:
+    """Build the shared AI drafter and inventory AI (genai.Client setup runs off the event loop)."""
+    if not settings.gemini_api_key:
         logger.warning("GEMINI_API_KEY not set — AI drafts and inventory AI disabled")
+        return
+    await asyncio.gather(get_drafter(), get_inventory_ai())
+    logger.info("AI Drafter initialized (model: gemini-2.0-flash)")
+    logger.info("Inventory AI initialized (model: gemini-2.0-flash)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan — startup and shutdown."""
+    global hosttools, ntfy
+
+    logger.info("Starting VBR Platform...")
+
+    # Database and API clients don't depend on each other — set them up concurrently
+    _, hosttools, ntfy, _ = await asyncio.gather(
+        init_db(),
+        _init_hosttools(),
+        _init_ntfy(),
+        _init_ai(),
+    )
 
     # Wire up services to routes
-    set_services(hosttools, ntfy, ai_drafter, inventory_ai)
+    set_services(hosttools, ntfy)
 
     # Start background sync task
     sync_task = None
@@ -107,6 +116,8 @@ async def lifespan(app: FastAPI):
         await hosttools.close()
     if ntfy:
         await ntfy.close()
+    await close_drafter()
+    await close_inventory_ai()
     logger.info("Shutdown complete")
 
 
@@ -147,6 +158,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses (item/location lists) for mobile clients
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # API routes
 app.include_router(api_router, prefix="/api")
 
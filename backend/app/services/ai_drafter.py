@@ -5,17 +5,22 @@ property knowledge and conversation context. Draft-only: all messages
 require human approval before sending.
 """
 
+import asyncio
 import logging
 import re
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
+import httpx
 from google import genai
 from google.genai import types
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, load_only
 
+from app.core.config import settings
 from app.db.models import KnowledgeEntry, Message, Reservation
 
 logger = logging.getLogger(__name__)
@@ -58,21 +63,143 @@ You will receive:
 Generate a reply that Pierre can send as-is or edit."""
 
 # Question categories for tracking AI accuracy per topic
-QUESTION_CATEGORIES = [
+QUESTION_CATEGORIES = frozenset({
     "WiFi", "CheckIn", "CheckOut", "Bathroom", "Kitchen", "Laundry",
     "Heating", "TV", "Transport", "LocalArea", "LockInfo", "Amenities",
     "EarlyCheckIn", "LateCheckOut", "LuggageStorage", "Complaint",
     "Emergency", "Pricing", "Cancellation", "SpecialRequest", "General",
-]
+})
+
+# The well-formed reply (REPLY / CONFIDENCE / CATEGORY in order), parsed in one pass
+_RESPONSE_RE = re.compile(
+    r"REPLY:\s*\n(?P<draft>.*?)\nCONFIDENCE:\s*(?P<conf>[\d.]+)\s*\nCATEGORY:\s*(?P<cat>\w+)",
+    re.DOTALL,
+)
+# Fallbacks for replies that drift from the format
+_REPLY_RE = re.compile(r"REPLY:\s*\n(.*?)(?=\nCONFIDENCE:|\Z)", re.DOTALL)
+_CONFIDENCE_TAIL_RE = re.compile(r"\nCONFIDENCE:.*", re.DOTALL)
+_CONFIDENCE_RE = re.compile(r"CONFIDENCE:\s*([\d.]+)")
+_CATEGORY_RE = re.compile(r"CATEGORY:\s*(\w+)")
+
+# Keep warm connections to the Gemini API across drafts, and retry transient
+# failures (429 / 5xx) with exponential backoff instead of failing the draft
+GEMINI_HTTP_OPTIONS = types.HttpOptions(
+    async_client_args={
+        "limits": httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+    },
+    retry_options=types.HttpRetryOptions(attempts=3, initial_delay=1.0, max_delay=8.0),
+)
+
+# Conversation history sent to the model: the most recent messages, up to
+# HISTORY_LIMIT rows and roughly 6000 tokens (~3.5 chars/token) of body text
+HISTORY_LIMIT = 20
+HISTORY_CHAR_BUDGET = 21000
+# Older history bodies are clipped to this; the guest message being replied to is sent whole
+HISTORY_BODY_CHARS = 2000
+
+
+def _trim_history(messages: list[Message]) -> list[Message]:
+    """Keep the newest messages that fit HISTORY_CHAR_BUDGET (always at least the latest)."""
+    used = 0
+    start = len(messages)
+    while start > 0:
+        used += min(len(messages[start - 1].body or ""), HISTORY_BODY_CHARS)
+        if used > HISTORY_CHAR_BUDGET and start < len(messages):
+            break
+        start -= 1
+    return messages[start:]
+
+
+def _clip_body(body: str) -> str:
+    if len(body) <= HISTORY_BODY_CHARS:
+        return body
+    return f"{body[:HISTORY_BODY_CHARS]} [... truncated {len(body) - HISTORY_BODY_CHARS} chars ...]"
+
+
+# Static closing section of every draft prompt
+_TASK_BLOCK = """## Your Task
+Reply to the guest's latest message. Provide your response in this exact format:
+
+REPLY:
+<your suggested reply here>
+
+CONFIDENCE: <number between 0.0 and 1.0>
+CATEGORY: <one of: WiFi, CheckIn, CheckOut, Bathroom, Kitchen, Laundry, Heating, TV, Transport, LocalArea, LockInfo, Amenities, EarlyCheckIn, LateCheckOut, LuggageStorage, Complaint, Emergency, Pricing, Cancellation, SpecialRequest, General>"""
+
+# English day/month names for prompt dates (plain tuple lookups instead of strftime)
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _format_date(dt: datetime) -> str:
+    """Format as e.g. 'Fri 02 Jan 2026' (same as strftime('%a %d %b %Y'))."""
+    return f"{_DAYS[dt.weekday()]} {dt.day:02d} {_MONTHS[dt.month - 1]} {dt.year}"
+
+
+def _format_message_time(dt: datetime) -> str:
+    """Format as e.g. '02 Jan 14:05' (same as strftime('%d %b %H:%M'))."""
+    return f"{dt.day:02d} {_MONTHS[dt.month - 1]} {dt.hour:02d}:{dt.minute:02d}"
+
+
+# Knowledge base snapshots per house, reused across drafts (~50 rarely-changing rows)
+KB_CACHE_TTL = 60  # seconds
+
+
+@dataclass(frozen=True)
+class KnowledgeSnippet:
+    """Detached copy of the KnowledgeEntry fields the prompt needs."""
+
+    id: int
+    category: str
+    question: Optional[str]
+    answer: str
+
+
+@dataclass(frozen=True)
+class KnowledgeContext:
+    """A house's relevant knowledge, with its prompt section pre-rendered."""
+
+    entries: list[KnowledgeSnippet]
+    ids: list[int]
+    block: str  # "## Property Knowledge Base" section, or "" if there are no entries
+    expires: float
+
+
+def _render_knowledge_block(entries: list[KnowledgeSnippet]) -> str:
+    if not entries:
+        return ""
+    return "## Property Knowledge Base\n" + "\n\n".join(
+        f"[{e.category}] Q: {e.question}\nA: {e.answer}" if e.question
+        else f"[{e.category}] {e.answer}"
+        for e in entries
+    )
+
+
+_kb_cache: dict[Optional[str], KnowledgeContext] = {}
+
+
+def invalidate_knowledge_cache():
+    """Drop cached knowledge snapshots (call after any KnowledgeEntry write commits)."""
+    _kb_cache.clear()
 
 
 class AIDrafter:
     """Gemini-powered draft reply generator."""
 
+    # Static per-call config, built once rather than per draft
+    _BASE_CONFIG = types.GenerateContentConfig(
+        system_instruction=SYSTEM_PROMPT,
+        max_output_tokens=1024,
+        temperature=0.4,
+    )
+
     def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+        self.client = genai.Client(api_key=api_key, http_options=GEMINI_HTTP_OPTIONS)
         self.model = "gemini-2.0-flash"
 
+    async def close(self):
+        await self.client.aio.aclose()
+
     async def generate_draft(
         self,
         session: AsyncSession,
@@ -89,64 +216,98 @@ class AIDrafter:
                 "tokens_used": int,     # Total tokens consumed
             }
         """
+        user_prompt, knowledge_ids = await self.prepare_prompt(session, reservation_id)
+
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=user_prompt,
+            config=self._BASE_CONFIG,
+        )
+
+        return self._build_result(response.text, response.usage_metadata, knowledge_ids)
+
+    async def stream_draft(self, user_prompt: str, knowledge_ids: list[int]) -> AsyncIterator[dict]:
+        """Stream a draft for a prompt from prepare_prompt().
+
+        Yields {"text": ...} for each chunk of raw model output as it arrives,
+        then a final {"done": True, ...} carrying the same fields as generate_draft.
+        """
+        buffer = []
+        usage = None
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=user_prompt,
+            config=self._BASE_CONFIG,
+        )
+        async for chunk in stream:
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+            if chunk.text:
+                buffer.append(chunk.text)
+                yield {"text": chunk.text}
+
+        yield {"done": True, **self._build_result("".join(buffer), usage, knowledge_ids)}
+
+    async def prepare_prompt(
+        self,
+        session: AsyncSession,
+        reservation_id: int,
+    ) -> tuple[str, list[int]]:
+        """Load the booking, history and knowledge for a draft.
+
+        Returns (user_prompt, knowledge entry IDs used). Raises ValueError if
+        the reservation doesn't exist or has no messages.
+        """
         # 1. Load reservation with listing
         res_result = await session.execute(
             select(Reservation)
-            .options(selectinload(Reservation.listing))
+            .options(joinedload(Reservation.listing))
             .where(Reservation.id == reservation_id)
         )
         reservation = res_result.scalar_one_or_none()
         if not reservation:
             raise ValueError(f"Reservation {reservation_id} not found")
 
-        # 2. Load conversation history (excluding templates and unsent drafts)
+        # 2. Load recent conversation history (excluding templates and unsent drafts)
         msg_result = await session.execute(
             select(Message)
+            .options(load_only(Message.sender, Message.body, Message.timestamp))
             .where(
                 Message.reservation_id == reservation_id,
                 Message.is_template == False,
                 Message.is_draft == False,
             )
-            .order_by(Message.timestamp.asc())
+            .order_by(Message.timestamp.desc())
+            .limit(HISTORY_LIMIT)
         )
-        messages = msg_result.scalars().all()
+        messages = _trim_history(msg_result.scalars().all()[::-1])
 
         if not messages:
             raise ValueError("No messages in conversation")
 
         # 3. Load relevant knowledge entries (filtered by house)
         house_code = reservation.listing.house_code if reservation.listing else None
-        knowledge_entries = await self._get_relevant_knowledge(session, house_code)
+        knowledge = await self._get_relevant_knowledge(session, house_code)
 
         # 4. Build the prompt
-        user_prompt = self._build_user_prompt(reservation, messages, knowledge_entries)
+        user_prompt = self._build_user_prompt(reservation, messages, knowledge.block)
 
-        # 5. Call Gemini
         logger.info(
             "Generating draft for reservation %d (%s)",
             reservation_id,
             reservation.guest_name,
         )
+        return user_prompt, knowledge.ids
 
-        response = await self.client.aio.models.generate_content(
-            model=self.model,
-            contents=user_prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_PROMPT,
-                max_output_tokens=1024,
-                temperature=0.4,
-            ),
-        )
-
-        # 6. Parse response
-        raw_text = response.text
+    def _build_result(self, raw_text: str, usage_metadata, knowledge_ids: list[int]) -> dict:
+        """Parse the model output and token usage into the draft result dict."""
         draft, confidence, category = self._parse_response(raw_text)
 
         # Token usage
         tokens_used = 0
-        if response.usage_metadata:
-            prompt_tokens = response.usage_metadata.prompt_token_count or 0
-            response_tokens = response.usage_metadata.candidates_token_count or 0
+        if usage_metadata:
+            prompt_tokens = usage_metadata.prompt_token_count or 0
+            response_tokens = usage_metadata.candidates_token_count or 0
             tokens_used = prompt_tokens + response_tokens
 
         logger.info(
@@ -158,7 +319,7 @@ class AIDrafter:
             "draft": draft,
             "confidence": confidence,
             "category": category,
-            "knowledge_used": [e.id for e in knowledge_entries],
+            "knowledge_used": knowledge_ids,
             "tokens_used": tokens_used,
         }
 
@@ -166,80 +327,81 @@ class AIDrafter:
         self,
         session: AsyncSession,
         house_code: Optional[str],
-    ) -> list[KnowledgeEntry]:
+    ) -> KnowledgeContext:
         """Get knowledge entries relevant to the guest's property.
 
         With ~50 entries total, we inject all house-relevant entries.
-        No embeddings or RAG needed at this scale.
+        No embeddings or RAG needed at this scale. Served (already rendered
+        for the prompt) from a short per-house TTL cache.
         """
-        result = await session.execute(
-            select(KnowledgeEntry).where(KnowledgeEntry.active == True)
+        cached = _kb_cache.get(house_code)
+        if cached is not None and cached.expires > time.monotonic():
+            return cached
+
+        query = select(
+            KnowledgeEntry.id,
+            KnowledgeEntry.category,
+            KnowledgeEntry.question,
+            KnowledgeEntry.answer,
+        ).where(KnowledgeEntry.active == True)
+        # Skip entries tagged for the wrong house
+        if house_code in ("193", "195"):
+            query = query.where(or_(
+                KnowledgeEntry.house_scope.is_(None),
+                KnowledgeEntry.house_scope == house_code,
+            ))
+        result = await session.execute(query.order_by(KnowledgeEntry.id))
+
+        relevant = [KnowledgeSnippet(*row) for row in result]
+        context = KnowledgeContext(
+            entries=relevant,
+            ids=[e.id for e in relevant],
+            block=_render_knowledge_block(relevant),
+            expires=time.monotonic() + KB_CACHE_TTL,
         )
-        all_entries = result.scalars().all()
-
-        relevant = []
-        for entry in all_entries:
-            answer_lower = entry.answer.lower()
-            # Skip entries tagged for the wrong house
-            if house_code == "193" and "[195 only]" in answer_lower:
-                continue
-            if house_code == "195" and "[193 only]" in answer_lower:
-                continue
-            relevant.append(entry)
-
-        return relevant
+        _kb_cache[house_code] = context
+        return context
 
     def _build_user_prompt(
         self,
         reservation: Reservation,
         messages: list[Message],
-        knowledge: list[KnowledgeEntry],
+        knowledge_block: str,
     ) -> str:
         """Build the user prompt with booking context, knowledge, and conversation."""
         parts = []
 
         # Booking context
-        listing_name = reservation.listing.name if reservation.listing else "Unknown"
-        house_code = reservation.listing.house_code if reservation.listing else "unknown"
+        listing = reservation.listing
+        listing_name = listing.name if listing else "Unknown"
+        house_code = listing.house_code if listing else "unknown"
         guest_first = reservation.guest_name.split()[0] if reservation.guest_name else "Guest"
+        now = datetime.utcnow()
 
         parts.append(f"""## Booking Context
 - Guest: {reservation.guest_name} (first name: {guest_first})
 - Property: {listing_name} (House {house_code})
-- Check-in: {reservation.check_in.strftime('%a %d %b %Y') if reservation.check_in else 'unknown'}
-- Check-out: {reservation.check_out.strftime('%a %d %b %Y') if reservation.check_out else 'unknown'}
+- Check-in: {_format_date(reservation.check_in) if reservation.check_in else 'unknown'}
+- Check-out: {_format_date(reservation.check_out) if reservation.check_out else 'unknown'}
 - Guests: {reservation.num_guests or 'unknown'}
 - Platform: {reservation.platform or 'unknown'}
-- Today: {datetime.utcnow().strftime('%a %d %b %Y %H:%M UTC')}""")
+- Today: {_format_date(now)} {now.hour:02d}:{now.minute:02d} UTC""")
 
         # Knowledge base
-        if knowledge:
-            kb_lines = []
-            for e in knowledge:
-                if e.question:
-                    kb_lines.append(f"[{e.category}] Q: {e.question}\nA: {e.answer}")
-                else:
-                    kb_lines.append(f"[{e.category}] {e.answer}")
-            parts.append("## Property Knowledge Base\n" + "\n\n".join(kb_lines))
-
-        # Conversation history (last 20 messages to stay within context)
-        recent_messages = messages[-20:]
-        conv_lines = []
-        for msg in recent_messages:
-            role = "GUEST" if msg.sender == "guest" else "HOST"
-            time_str = msg.timestamp.strftime("%d %b %H:%M") if msg.timestamp else ""
-            conv_lines.append(f"[{time_str}] {role}: {msg.body}")
-        parts.append("## Conversation History\n" + "\n\n".join(conv_lines))
-
-        # Task
-        parts.append("""## Your Task
-Reply to the guest's latest message. Provide your response in this exact format:
+        if knowledge_block:
+            parts.append(knowledge_block)
 
-REPLY:
-<your suggested reply here>
+        # Conversation history (already trimmed to the history budget to stay within context);
+        # only the latest guest message — the one being answered — keeps its full body
+        reply_to = next((msg for msg in reversed(messages) if msg.sender == "guest"), None)
+        parts.append("## Conversation History\n" + "\n\n".join(
+            f"[{_format_message_time(msg.timestamp) if msg.timestamp else ''}] "
+            f"{'GUEST' if msg.sender == 'guest' else 'HOST'}: "
+            f"{msg.body if msg is reply_to else _clip_body(msg.body)}"
+            for msg in messages
+        ))
 
-CONFIDENCE: <number between 0.0 and 1.0>
-CATEGORY: <one of: WiFi, CheckIn, CheckOut, Bathroom, Kitchen, Laundry, Heating, TV, Transport, LocalArea, LockInfo, Amenities, EarlyCheckIn, LateCheckOut, LuggageStorage, Complaint, Emergency, Pricing, Cancellation, SpecialRequest, General>""")
+        parts.append(_TASK_BLOCK)
 
         return "\n\n".join(parts)
 
@@ -248,25 +410,70 @@ CATEGORY: <one of: WiFi, CheckIn, CheckOut, Bathroom, Kitchen, Laundry, Heating,
 
         Falls back gracefully if the format is unexpected.
         """
-        # Extract REPLY section
-        reply_match = re.search(
-            r"REPLY:\s*\n(.*?)(?=\nCONFIDENCE:|\Z)",
-            raw,
-            re.DOTALL,
-        )
-        draft = reply_match.group(1).strip() if reply_match else raw.strip()
-
-        # If the draft still contains our markers, clean them out
-        draft = re.sub(r"\nCONFIDENCE:.*", "", draft, flags=re.DOTALL).strip()
+        match = _RESPONSE_RE.search(raw)
+        if match:
+            draft = match.group("draft").strip()
+            confidence = float(match.group("conf"))
+            category = match.group("cat")
+        else:
+            # Extract REPLY section
+            reply_match = _REPLY_RE.search(raw)
+            draft = reply_match.group(1).strip() if reply_match else raw.strip()
+
+            # If the draft still contains our markers, clean them out
+            draft = _CONFIDENCE_TAIL_RE.sub("", draft).strip()
+
+            # Extract CONFIDENCE
+            conf_match = _CONFIDENCE_RE.search(raw)
+            confidence = float(conf_match.group(1)) if conf_match else 0.7
+
+            # Extract CATEGORY
+            cat_match = _CATEGORY_RE.search(raw)
+            category = cat_match.group(1) if cat_match else "General"
 
-        # Extract CONFIDENCE
-        conf_match = re.search(r"CONFIDENCE:\s*([\d.]+)", raw)
-        confidence = float(conf_match.group(1)) if conf_match else 0.7
-
-        # Extract CATEGORY
-        cat_match = re.search(r"CATEGORY:\s*(\w+)", raw)
-        category = cat_match.group(1) if cat_match else "General"
         if category not in QUESTION_CATEGORIES:
             category = "General"
 
         return draft, min(max(confidence, 0.0), 1.0), category
+
+
+# ---------------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------------
+
+_drafter: Optional[AIDrafter] = None
+_drafter_key: Optional[str] = None
+_drafter_lock = asyncio.Lock()
+
+
+async def get_drafter() -> Optional[AIDrafter]:
+    """Return the shared AIDrafter, or None if GEMINI_API_KEY isn't set.
+
+    Built on first use (off the event loop, since genai.Client setup is
+    synchronous) and rebuilt if the configured key changes. Usable as a
+    FastAPI dependency, so tests can override it.
+    """
+    global _drafter, _drafter_key
+    api_key = settings.gemini_api_key
+    if _drafter is not None and _drafter_key == api_key:
+        return _drafter
+    if not api_key:
+        return None
+
+    async with _drafter_lock:
+        if _drafter is None or _drafter_key != api_key:
+            previous = _drafter
+            _drafter = await asyncio.to_thread(AIDrafter, api_key)
+            _drafter_key = api_key
+            if previous:
+                await previous.close()
+    return _drafter
+
+
+async def close_drafter():
+    """Close the shared AIDrafter's connections (app shutdown)."""
+    global _drafter, _drafter_key
+    if _drafter:
+        await _drafter.close()
+    _drafter = None
+    _drafter_key = None
@@ -0,0 +1,45 @@
+"""Emergency handling for incoming guest messages.
+
+Keyword detection plus a fan-out that alerts every notification channel
+(ntfy, Pushover) at its highest priority.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# Emergency keywords that trigger max-priority notifications
+EMERGENCY_KEYWORDS = [
+    "emergency", "fire", "flood", "locked out", "lockout",
+    "lock out", "can't get in", "cant get in", "stuck outside",
+    "help me", "urgent", "police", "ambulance",
+]
+
+# All keywords as one alternation — a single C-level scan per message
+_EMERGENCY_RE = re.compile("|".join(map(re.escape, EMERGENCY_KEYWORDS)), re.IGNORECASE)
+
+
+def is_emergency_message(text: str) -> bool:
+    """Check if a guest message contains emergency keywords."""
+    return _EMERGENCY_RE.search(text) is not None
+
+
+async def notify_all_emergency(
+    clients: Iterable, guest_name: str, message_text: str, reservation_url: str = ""
+):
+    """Send an emergency alert through every client at once.
+
+    Each client needs a notify_emergency(guest_name, message_text, reservation_url)
+    coroutine. Sends run concurrently and one provider failing doesn't stop the others.
+    """
+    clients = [c for c in clients if c]
+    results = await asyncio.gather(
+        *(c.notify_emergency(guest_name, message_text, reservation_url) for c in clients),
+        return_exceptions=True,
+    )
+    for client, result in zip(clients, results):
+        if isinstance(result, Exception):
+            logger.error("Emergency alert via %s failed: %s", type(client).__name__, result)
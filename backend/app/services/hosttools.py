@@ -5,16 +5,52 @@ Base URL: https://app.hosttools.com/api/
 Auth: Header `authToken: <TOKEN>`
 """
 
+import asyncio
+import importlib.util
 import logging
+import random
+import time
 from datetime import date, datetime
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://app.hosttools.com/api"
 
+# Sync fans out one request per listing; keep enough warm connections that
+# bursts reuse them instead of paying a fresh TLS handshake each time
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0)
+# HTTP/2 multiplexes those requests over one connection (needs the h2 extra)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Concurrent requests in the *_bulk fan-outs — no more than the pool keeps warm
+BULK_CONCURRENCY = HTTP_LIMITS.max_keepalive_connections
+
+# Retry transient failures with jittered exponential backoff
+RETRY_ATTEMPTS = 5
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_MAX_DELAY = 8.0
+
+# Read-only GET responses are cached briefly, by path prefix (seconds)
+CACHE_TTLS = (
+    ("/getlistings", 600),
+    ("/getuser", 600),
+    ("/getreviews/", 300),
+    ("/getreservations/", 60),
+    ("/getreservation/", 60),
+    ("/getcalendar/", 60),
+)
+_CACHE_PRUNE_THRESHOLD = 256
+
+
+def _cache_ttl(path: str) -> int:
+    for prefix, ttl in CACHE_TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return 0
+
 
 class HostToolsClient:
     """Client for the Host Tools API."""
@@ -25,28 +61,102 @@ class HostToolsClient:
             base_url=BASE_URL,
             headers={"authToken": auth_token},
             timeout=30.0,
+            limits=HTTP_LIMITS,
+            http2=HTTP2_AVAILABLE,
         )
+        # (path, params) -> (expires_at, parsed JSON); results are shared, don't mutate them
+        self._cache: dict[tuple, tuple[float, Any]] = {}
 
     async def close(self):
         await self._client.aclose()
 
-    async def _get(self, path: str, params: dict | None = None) -> Any:
-        """Make a GET request to the Host Tools API."""
-        resp = await self._client.get(path, params=params)
-        resp.raise_for_status()
-        return resp.json()
+    def invalidate_cache(self, *prefixes: str):
+        """Drop cached GETs whose path starts with any prefix (all of them if none given)."""
+        if not prefixes:
+            self._cache.clear()
+            return
+        for key in [k for k in self._cache if k[0].startswith(prefixes)]:
+            del self._cache[key]
+
+    async def _request_with_retry(self, method: str, path: str, idempotent: bool, **kwargs) -> httpx.Response:
+        """Send a request, retrying 429/5xx responses and transport errors with backoff.
+
+        Non-idempotent requests (sending a message) are only retried when the
+        server can't have acted on them: 429s and failures to connect.
+        """
+        for attempt in range(RETRY_ATTEMPTS):
+            last_attempt = attempt == RETRY_ATTEMPTS - 1
+            delay = min(2 ** attempt * 0.25, RETRY_MAX_DELAY) + random.random() * 0.1
+            try:
+                resp = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if last_attempt or not retryable:
+                    raise
+                logger.warning("Host Tools %s %s failed (%s), retrying", method, path, e)
+            else:
+                retryable = resp.status_code == 429 or (idempotent and resp.status_code in RETRY_STATUSES)
+                if last_attempt or not retryable:
+                    resp.raise_for_status()
+                    return resp
+                retry_after = resp.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = min(float(retry_after), RETRY_MAX_DELAY * 4)
+                logger.warning("Host Tools %s %s returned %d, retrying", method, path, resp.status_code)
+            await asyncio.sleep(delay)
+
+    async def _get(self, path: str, params: dict | None = None, no_cache: bool = False) -> Any:
+        """Make a GET request to the Host Tools API (served from a short TTL cache)."""
+        ttl = _cache_ttl(path)
+        key = (path, tuple(sorted(params.items())) if params else ())
+        now = time.monotonic()
+        if ttl and not no_cache:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+
+        resp = await self._request_with_retry("GET", path, idempotent=True, params=params)
+        result = orjson.loads(resp.content)
+
+        if ttl:
+            if len(self._cache) >= _CACHE_PRUNE_THRESHOLD:
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            self._cache[key] = (now + ttl, result)
+        return result
 
     async def _post(self, path: str, data: dict | None = None) -> Any:
         """Make a POST request to the Host Tools API."""
-        resp = await self._client.post(path, json=data)
-        resp.raise_for_status()
-        return resp.json()
+        resp = await self._request_with_retry("POST", path, idempotent=False, json=data)
+        return orjson.loads(resp.content)
+
+    async def _fan_out(
+        self,
+        listing_ids: list[str],
+        fetch: Callable[[str], Awaitable[list[dict]]],
+        what: str,
+    ) -> dict[str, list[dict]]:
+        """Run fetch(listing_id) for every listing concurrently (bounded by BULK_CONCURRENCY).
+
+        A listing whose request fails is logged and left out of the result.
+        """
+        sem = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def one(listing_id: str):
+            async with sem:
+                try:
+                    return listing_id, await fetch(listing_id)
+                except Exception as e:
+                    logger.error("Failed to fetch %s for listing %s: %s", what, listing_id, e)
+                    return listing_id, None
+
+        results = await asyncio.gather(*(one(lid) for lid in listing_ids))
+        return {lid: data for lid, data in results if data is not None}
 
     # ---- Listings ----
 
-    async def get_listings(self) -> list[dict]:
+    async def get_listings(self, no_cache: bool = False) -> list[dict]:
         """Get all listings."""
-        result = await self._get("/getlistings")
+        result = await self._get("/getlistings", no_cache=no_cache)
         # Host Tools returns { listings: [...] } or just a list
         if isinstance(result, dict) and "listings" in result:
             return result["listings"]
@@ -61,20 +171,32 @@ class HostToolsClient:
         listing_id: str,
         start: date | str,
         end: date | str,
+        no_cache: bool = False,
     ) -> list[dict]:
         """Get reservations for a listing in a date range."""
         start_str = start.isoformat() if isinstance(start, date) else start
         end_str = end.isoformat() if isinstance(end, date) else end
-        result = await self._get(f"/getreservations/{listing_id}/{start_str}/{end_str}")
+        result = await self._get(f"/getreservations/{listing_id}/{start_str}/{end_str}", no_cache=no_cache)
         if isinstance(result, dict) and "reservations" in result:
             return result["reservations"]
         if isinstance(result, list):
             return result
         return []
 
-    async def get_reservation(self, reservation_id: str) -> dict:
+    async def get_reservations_bulk(
+        self,
+        listing_ids: list[str],
+        start: date | str,
+        end: date | str,
+    ) -> dict[str, list[dict]]:
+        """Get reservations for many listings concurrently, keyed by listing ID."""
+        return await self._fan_out(
+            listing_ids, lambda lid: self.get_reservations(lid, start, end), "reservations"
+        )
+
+    async def get_reservation(self, reservation_id: str, no_cache: bool = False) -> dict:
         """Get a single reservation by ID."""
-        return await self._get(f"/getreservation/{reservation_id}")
+        return await self._get(f"/getreservation/{reservation_id}", no_cache=no_cache)
 
     # ---- Messages ----
 
@@ -84,22 +206,29 @@ class HostToolsClient:
         POST /api/sendmessage/{reservationid}
         Body: { "message": "text" }
         """
-        return await self._post(
+        result = await self._post(
             f"/sendmessage/{reservation_id}",
             data={"message": message},
         )
+        # The thread changed — reservation payloads embed their messages
+        self.invalidate_cache("/getreservations/", f"/getreservation/{reservation_id}")
+        return result
 
     # ---- Reviews ----
 
-    async def get_reviews(self, listing_id: str) -> list[dict]:
+    async def get_reviews(self, listing_id: str, no_cache: bool = False) -> list[dict]:
         """Get reviews for a listing."""
-        result = await self._get(f"/getreviews/{listing_id}")
+        result = await self._get(f"/getreviews/{listing_id}", no_cache=no_cache)
         if isinstance(result, dict) and "reviews" in result:
             return result["reviews"]
         if isinstance(result, list):
             return result
         return []
 
+    async def get_reviews_bulk(self, listing_ids: list[str]) -> dict[str, list[dict]]:
+        """Get reviews for many listings concurrently, keyed by listing ID."""
+        return await self._fan_out(listing_ids, self.get_reviews, "reviews")
+
     # ---- Calendar ----
 
     async def get_calendar(
@@ -107,20 +236,32 @@ class HostToolsClient:
         listing_id: str,
         start: date | str,
         end: date | str,
+        no_cache: bool = False,
     ) -> list[dict]:
         """Get calendar/availability for a listing."""
         start_str = start.isoformat() if isinstance(start, date) else start
         end_str = end.isoformat() if isinstance(end, date) else end
-        result = await self._get(f"/getcalendar/{listing_id}/{start_str}/{end_str}")
+        result = await self._get(f"/getcalendar/{listing_id}/{start_str}/{end_str}", no_cache=no_cache)
         if isinstance(result, list):
             return result
         return []
 
+    async def get_calendars_bulk(
+        self,
+        listing_ids: list[str],
+        start: date | str,
+        end: date | str,
+    ) -> dict[str, list[dict]]:
+        """Get calendars for many listings concurrently, keyed by listing ID."""
+        return await self._fan_out(
+            listing_ids, lambda lid: self.get_calendar(lid, start, end), "calendar"
+        )
+
     # ---- User / Account ----
 
-    async def get_user(self) -> dict:
+    async def get_user(self, no_cache: bool = False) -> dict:
         """Get account info."""
-        return await self._get("/getuser")
+        return await self._get("/getuser", no_cache=no_cache)
 
     # ---- Webhooks ----
 
@@ -5,16 +5,38 @@ Uses the same Gemini 2.0 Flash model and patterns as the guest messaging
 AI drafter, but with inventory-specific system prompts and output parsing.
 """
 
-import json
+import asyncio
+import hashlib
 import logging
 import re
+import time
+from collections import OrderedDict
 from typing import Optional
 
+import orjson
 from google import genai
 from google.genai import types
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Markdown code fence Gemini sometimes wraps its JSON reply in
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*\n?(.*?)\n?```", re.DOTALL)
+
+# Prompt flags for a location: (dict key, label)
+_LOCATION_FLAGS = (("outdoor", "outdoor"), ("locked", "locked"), ("guest_accessible", "guest-accessible"))
+
+
+def _format_location(loc: dict) -> str:
+    """One "- CODE: house name (inside parent) [flags] — description" prompt line."""
+    flags = ", ".join(label for key, label in _LOCATION_FLAGS if loc.get(key))
+    flag_str = f" [{flags}]" if flags else ""
+    parent_info = f" (inside {loc['parent_name']})" if loc.get("parent_name") else ""
+    desc = f" — {loc['description']}" if loc.get("description") else ""
+    return f"- {loc['code']}: {loc['house_code']} {loc['name']}{parent_info}{flag_str}{desc}"
+
+
 # ---------------------------------------------------------------------------
 # System prompts
 # ---------------------------------------------------------------------------
@@ -123,6 +145,17 @@ Rules:
 - Keep each alias short (1-5 words)
 """
 
+ALIASES_BATCH_SYSTEM_PROMPT = ALIASES_SYSTEM_PROMPT + """
+You will receive a numbered list of items. Instead of a single array, return ONE JSON
+object mapping each item's number (as a string) to its array of aliases:
+{"1": ["drain cleaner", "sink unblocker"], "2": ["hoover", "vac"]}
+"""
+
+# Items per batched alias call (keeps the JSON reply well inside max_tokens)
+ALIAS_BATCH_SIZE = 25
+# Batched alias calls in flight at once (large imports stay under the Gemini rate limit)
+ALIAS_BATCH_CONCURRENCY = 4
+
 BULK_IMPORT_SYSTEM_PROMPT = """\
 You are an inventory assistant. Parse a freeform text dump of items and their locations
 into structured data. The text is from someone rapidly listing what's in each storage area.
@@ -160,12 +193,26 @@ Rules:
 """
 
 
+# Low-temperature replies are near-deterministic, so identical prompts (the same
+# item name suggested/aliased again, a repeated search) reuse the earlier answer
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # seconds
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.5
+
+
 class InventoryAI:
     """Gemini-powered AI for inventory operations."""
 
     def __init__(self, api_key: str):
         self.client = genai.Client(api_key=api_key)
         self.model = "gemini-2.0-flash"
+        # prompt digest -> (expires_at, response text), least recently used first
+        self._response_cache: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+        # (locations list, formatted prompt block) for the last list formatted
+        self._locations_context_cache: Optional[tuple[list[dict], str]] = None
+
+    async def close(self):
+        await self.client.aio.aclose()
 
     async def _call_gemini(
         self,
@@ -174,7 +221,22 @@ class InventoryAI:
         temperature: float = 0.3,
         max_tokens: int = 2048,
     ) -> str:
-        """Make a Gemini API call and return the raw text response."""
+        """Make a Gemini API call and return the raw text response.
+
+        Calls at temperature <= RESPONSE_CACHE_MAX_TEMPERATURE are served from
+        an in-process LRU cache keyed by model, settings and prompts.
+        """
+        cacheable = temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+        if cacheable:
+            key = hashlib.blake2b(
+                f"{self.model}|{temperature}|{max_tokens}|{system_prompt}|{user_prompt}".encode(),
+                digest_size=20,
+            ).digest()
+            cached = self._response_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._response_cache.move_to_end(key)
+                return cached[1]
+
         response = await self.client.aio.models.generate_content(
             model=self.model,
             contents=user_prompt,
@@ -184,14 +246,22 @@ class InventoryAI:
                 temperature=temperature,
             ),
         )
-        return response.text
+        text = response.text
+
+        if cacheable and text:
+            self._response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, text)
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+        return text
 
     def _extract_json(self, text: str) -> dict | list:
         """Extract JSON from a Gemini response that may include markdown fences."""
-        # Try to find JSON in code blocks first
-        json_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(1).strip())
+        # Try to find JSON in code blocks first (skip the regex when there's no fence)
+        if "```" in text:
+            json_match = _JSON_FENCE_RE.search(text)
+            if json_match:
+                return orjson.loads(json_match.group(1).strip())
 
         # Try parsing the whole text as JSON
         # Find the first { or [ and last } or ]
@@ -202,29 +272,25 @@ class InventoryAI:
 
         if start_arr != -1 and (start_obj == -1 or start_arr < start_obj):
             end = text.rfind("]")
-            return json.loads(text[start_arr : end + 1])
+            return orjson.loads(text[start_arr : end + 1])
         else:
             end = text.rfind("}")
-            return json.loads(text[start_obj : end + 1])
+            return orjson.loads(text[start_obj : end + 1])
 
     def _format_locations_context(self, locations: list[dict]) -> str:
-        """Format location data for injection into prompts."""
-        lines = ["Known storage locations:"]
-        for loc in locations:
-            flags = []
-            if loc.get("outdoor"):
-                flags.append("outdoor")
-            if loc.get("locked"):
-                flags.append("locked")
-            if loc.get("guest_accessible"):
-                flags.append("guest-accessible")
-            flag_str = f" [{', '.join(flags)}]" if flags else ""
-            parent_info = f" (inside {loc['parent_name']})" if loc.get("parent_name") else ""
-            desc = f" — {loc['description']}" if loc.get("description") else ""
-            lines.append(
-                f"- {loc['code']}: {loc['house_code']} {loc['name']}{parent_info}{flag_str}{desc}"
-            )
-        return "\n".join(lines)
+        """Format location data for injection into prompts.
+
+        The routes hand over the same cached list until a location changes,
+        so the formatted block is reused for as long as that list is.
+        """
+        cached = self._locations_context_cache
+        if cached is not None and cached[0] is locations:
+            return cached[1]
+        text = "\n".join(
+            ["Known storage locations:"] + [_format_location(loc) for loc in locations]
+        )
+        self._locations_context_cache = (locations, text)
+        return text
 
     # ---- Public methods ----
 
@@ -359,3 +425,86 @@ class InventoryAI:
         except Exception as e:
             logger.error("AI alias generation failed: %s", e)
             return []
+
+    async def generate_search_aliases_batch(
+        self,
+        items: list[tuple[str, str]],
+    ) -> list[list[str]]:
+        """Generate search aliases for many (name, category) items at once.
+
+        One Gemini call per ALIAS_BATCH_SIZE items (up to ALIAS_BATCH_CONCURRENCY
+        batches run concurrently) instead of one per item. Returns alias lists aligned with `items`;
+        an item the model skipped, or a failed batch, gets [].
+        """
+        batches = [
+            items[i : i + ALIAS_BATCH_SIZE] for i in range(0, len(items), ALIAS_BATCH_SIZE)
+        ]
+        limit = asyncio.Semaphore(ALIAS_BATCH_CONCURRENCY)
+
+        async def run(batch: list[tuple[str, str]]) -> list[list[str]]:
+            async with limit:
+                return await self._alias_batch(batch)
+
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return [aliases for batch_result in results for aliases in batch_result]
+
+    async def _alias_batch(self, items: list[tuple[str, str]]) -> list[list[str]]:
+        """Run one batched alias call. Items are numbered so duplicate names stay distinct."""
+        lines = [f"{i}. {name} (category: {category})" for i, (name, category) in enumerate(items, 1)]
+        user_prompt = (
+            "Items:\n" + "\n".join(lines) + "\n\n"
+            "Generate alternative search terms for each item."
+        )
+
+        try:
+            raw = await self._call_gemini(
+                ALIASES_BATCH_SYSTEM_PROMPT, user_prompt, max_tokens=256 * len(items) + 256
+            )
+            result = self._extract_json(raw)
+            if not isinstance(result, dict):
+                return [[] for _ in items]
+            return [
+                [str(a).strip() for a in result.get(str(i), []) if a]
+                if isinstance(result.get(str(i)), list) else []
+                for i in range(1, len(items) + 1)
+            ]
+        except Exception as e:
+            logger.error("AI batch alias generation failed: %s", e)
+            return [[] for _ in items]
+
+
+_inventory_ai: Optional[InventoryAI] = None
+_inventory_ai_key: Optional[str] = None
+_inventory_ai_lock = asyncio.Lock()
+
+
+async def get_inventory_ai() -> Optional[InventoryAI]:
+    """Return the shared InventoryAI, or None if GEMINI_API_KEY isn't set.
+
+    One instance (and so one Gemini connection pool and response cache) per
+    process, built like get_drafter's. Usable as a FastAPI dependency.
+    """
+    global _inventory_ai, _inventory_ai_key
+    api_key = settings.gemini_api_key
+    if _inventory_ai is not None and _inventory_ai_key == api_key:
+        return _inventory_ai
+    if not api_key:
+        return None
+
+    async with _inventory_ai_lock:
+        if _inventory_ai is None or _inventory_ai_key != api_key:
+            previous = _inventory_ai
+            _inventory_ai = await asyncio.to_thread(InventoryAI, api_key)
+            _inventory_ai_key = api_key
+            if previous:
+                await previous.close()
+    return _inventory_ai
+
+
+async def close_inventory_ai():
+    """Close the shared InventoryAI's connections (app shutdown)."""
+    global _inventory_ai, _inventory_ai_key
+    if _inventory_ai:
+        await _inventory_ai.close()
+    _inventory_ai = None
+    _inventory_ai_key = None
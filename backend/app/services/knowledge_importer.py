@@ -6,15 +6,23 @@ and creates categorised entries for the AI knowledge base.
 
 import logging
 import re
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from sqlalchemy import delete
+import ijson
+from selectolax.lexbor import LexborHTMLParser
+from sqlalchemy import delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import KnowledgeEntry
+from app.db.models import KnowledgeEntry, knowledge_house_scope
 
 logger = logging.getLogger(__name__)
 
+# Sections of en.json that hold importable HTML blobs
+SECTIONS = ("content_html", "static_html")
+
+# Rows per INSERT when streaming an import
+IMPORT_BATCH_SIZE = 500
+
 # Map en.json keys → knowledge categories
 CATEGORY_MAP = {
     # content_html keys
@@ -109,15 +117,25 @@ QUESTION_MAP = {
 }
 
 
+# Line structure the DOM text dump would otherwise lose
+_BR_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_LI_RE = re.compile(r"<li>", re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
 def strip_html(html: str) -> str:
-    """Strip HTML tags, decode entities, collapse whitespace."""
-    text = re.sub(r"<br\s*/?>", "\n", html)
-    text = re.sub(r"<li>", "- ", text)
-    text = re.sub(r"</?(p|ul|ol|li|div|h[1-6]|strong|em|b|i|a|span|iframe|img|table|tr|td|th|thead|tbody)[^>]*>", "", text)
-    text = re.sub(r"<[^>]+>", "", text)  # catch-all remaining tags
-    text = text.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-    text = text.replace("&nbsp;", " ").replace("&#39;", "'").replace("&quot;", '"')
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    """Strip HTML tags, decode entities, collapse whitespace.
+
+    Parsed with lexbor rather than regex-stripped, so comments, script/style
+    bodies and attributes containing '>' don't leak into the text.
+    """
+    text = _BR_RE.sub("\n", html)
+    text = _LI_RE.sub("- ", text)
+    tree = LexborHTMLParser(text)
+    tree.strip_tags(["script", "style"])
+    text = tree.body.text(separator="") if tree.body else ""
+    text = text.replace("\xa0", " ")  # &nbsp; decodes to a non-breaking space
+    text = _BLANK_LINES_RE.sub("\n\n", text)
     return text.strip()
 
 
@@ -132,6 +150,41 @@ def _get_house_tag(key: str) -> str:
     return ""
 
 
+# Keys are fixed, so tag each mapped key once up front
+_HOUSE_TAGS = {key: _get_house_tag(key) for key in CATEGORY_MAP}
+
+
+def _build_entry(section_key: str, key: str, html_value: str) -> Optional[dict]:
+    """Turn one en.json key/HTML pair into a KnowledgeEntry row, or None to skip it."""
+    if not html_value or not html_value.strip():
+        return None
+
+    category = CATEGORY_MAP.get(key)
+    if not category:
+        logger.debug("Skipping unmapped key: %s.%s", section_key, key)
+        return None
+
+    plain_text = strip_html(html_value)
+    if not plain_text:
+        return None
+
+    answer = plain_text + _HOUSE_TAGS[key]
+    return {
+        "category": category,
+        "question": QUESTION_MAP.get(key),
+        "answer": answer,
+        "house_scope": knowledge_house_scope(answer),
+        "source": "imported",
+        "active": True,
+    }
+
+
+async def _clear_imported(session: AsyncSession) -> None:
+    await session.execute(
+        delete(KnowledgeEntry).where(KnowledgeEntry.source == "imported")
+    )
+
+
 async def import_from_en_json(
     session: AsyncSession,
     json_data: dict,
@@ -148,38 +201,79 @@ async def import_from_en_json(
         Number of entries imported
     """
     if replace:
-        await session.execute(
-            delete(KnowledgeEntry).where(KnowledgeEntry.source == "imported")
-        )
+        await _clear_imported(session)
+
+    rows = []
+    for section_key in SECTIONS:
+        for key, html_value in json_data.get(section_key, {}).items():
+            row = _build_entry(section_key, key, html_value)
+            if row:
+                rows.append(row)
+
+    if rows:
+        await session.execute(insert(KnowledgeEntry), rows)
+
+    logger.info("Imported %d knowledge entries from en.json", len(rows))
+    return len(rows)
+
+
+async def import_from_en_json_stream(
+    session: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    replace: bool = True,
+) -> int:
+    """Import knowledge entries from a streamed en.json body.
+
+    Parses incrementally with ijson so the document is never held in memory,
+    inserting rows in batches of IMPORT_BATCH_SIZE. Accepts either raw en.json
+    or the legacy {"json_data": {...}} wrapper.
+
+    Args:
+        session: Database session
+        chunks: Async iterator of raw request body bytes
+        replace: If True, delete existing imported entries first
+
+    Returns:
+        Number of entries imported
+    """
+    if replace:
+        await _clear_imported(session)
 
     count = 0
-    for section_key in ("content_html", "static_html"):
-        section = json_data.get(section_key, {})
-        for key, html_value in section.items():
-            if not html_value or not html_value.strip():
-                continue
+    batch = []
+    # Push-style parsing: feed chunks in as they arrive, drain events after each
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events)
 
-            category = CATEGORY_MAP.get(key)
-            if not category:
-                logger.debug("Skipping unmapped key: %s.%s", section_key, key)
+    async def flush_events():
+        nonlocal count, batch
+        for prefix, event, value in events:
+            if event != "string":
+                continue
+            path = prefix.split(".")
+            if len(path) < 2 or path[-2] not in SECTIONS or path[:-2] not in ([], ["json_data"]):
                 continue
 
-            plain_text = strip_html(html_value)
-            if not plain_text:
+            row = _build_entry(path[-2], path[-1], value)
+            if not row:
                 continue
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await session.execute(insert(KnowledgeEntry), batch)
+                count += len(batch)
+                batch = []
+        del events[:]
+
+    async for chunk in chunks:
+        if chunk:
+            parser.send(chunk)
+            await flush_events()
+    parser.close()
+    await flush_events()
 
-            question = QUESTION_MAP.get(key)
-            house_tag = _get_house_tag(key)
-
-            entry = KnowledgeEntry(
-                category=category,
-                question=question,
-                answer=plain_text + house_tag,
-                source="imported",
-                active=True,
-            )
-            session.add(entry)
-            count += 1
+    if batch:
+        await session.execute(insert(KnowledgeEntry), batch)
+        count += len(batch)
 
     logger.info("Imported %d knowledge entries from en.json", count)
     return count
@@ -6,8 +6,9 @@ When Pierre sends a message, this module:
 3. Extracts patterns from manual replies for future AI context
 """
 
+import hashlib
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -18,9 +19,10 @@ logger = logging.getLogger(__name__)
 
 
 def _fingerprint(text: str) -> str:
-    """Create a short fingerprint of text for dedup."""
-    normalized = " ".join(text.lower().split())[:200]
-    return normalized
+    """Create a short fingerprint of text for dedup (24 hex chars, fits the indexed column)."""
+    # Only the first 200 normalized chars count; bound the split on long replies
+    normalized = " ".join(text[:1024].lower().split())[:200]
+    return hashlib.blake2b(normalized.encode(), digest_size=12).hexdigest()
 
 
 async def record_reply_outcome(
@@ -48,12 +50,14 @@ async def record_reply_outcome(
     cat_record = result.scalar_one_or_none()
 
     if not cat_record:
-        cat_record = AutoReplyCategory(category=category)
+        # Counters set explicitly (column defaults only apply at INSERT) so the
+        # new row can wait for the commit instead of an early flush
+        cat_record = AutoReplyCategory(category=category, total_drafts=0, sent_unedited=0)
         session.add(cat_record)
-        await session.flush()
 
     cat_record.total_drafts += 1
-    cat_record.updated_at = datetime.utcnow()
+    # Columns hold naive UTC; utcnow() is deprecated from Python 3.12
+    cat_record.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
 
     if not message.was_edited:
         # AI draft sent as-is — great, increment accuracy counter
@@ -78,25 +82,21 @@ async def record_reply_outcome(
         logger.debug("Edit was trivial, skipping learning")
         return
 
-    # Check for duplicate learned entries
+    # Duplicate check and the guest question it answered, in one round trip
+    # (a single AsyncSession can't run the two queries concurrently)
     fp = _fingerprint(final)
-    existing = await session.execute(
-        select(KnowledgeEntry).where(
+    duplicate_id = (
+        select(KnowledgeEntry.id)
+        .where(
             KnowledgeEntry.source == "learned",
             KnowledgeEntry.category == category,
+            KnowledgeEntry.fingerprint == fp,
         )
+        .limit(1)
+        .scalar_subquery()
     )
-    for entry in existing.scalars().all():
-        if _fingerprint(entry.answer) == fp:
-            logger.debug("Duplicate learned entry, skipping")
-            return
-
-    # Build the learned knowledge entry
-    guest_name = reservation.guest_name.split()[0] if reservation.guest_name else "guest"
-
-    # Get the last guest message for context
-    msgs = await session.execute(
-        select(Message)
+    last_guest_body = (
+        select(Message.body)
         .where(
             Message.reservation_id == reservation.id,
             Message.sender == "guest",
@@ -104,9 +104,20 @@ async def record_reply_outcome(
         )
         .order_by(Message.timestamp.desc())
         .limit(1)
+        .scalar_subquery()
     )
-    last_guest_msg = msgs.scalar_one_or_none()
-    question_context = last_guest_msg.body[:200] if last_guest_msg else None
+    row = (
+        await session.execute(
+            select(duplicate_id.label("duplicate_id"), last_guest_body.label("guest_body"))
+        )
+    ).one()
+    if row.duplicate_id is not None:
+        logger.debug("Duplicate learned entry, skipping")
+        return
+
+    # Build the learned knowledge entry
+    guest_name = reservation.guest_name.split()[0] if reservation.guest_name else "guest"
+    question_context = row.guest_body[:200] if row.guest_body else None
 
     # Store as learned knowledge
     learned = KnowledgeEntry(
@@ -114,6 +125,7 @@ async def record_reply_outcome(
         question=f"Guest asked: {question_context}" if question_context else None,
         answer=f"Preferred reply style: {final}",
         source="learned",
+        fingerprint=fp,
         active=True,
     )
     session.add(learned)
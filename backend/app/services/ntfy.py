@@ -17,13 +17,6 @@ import httpx
 
 logger = logging.getLogger(__name__)
 
-# Emergency keywords that trigger priority 5 (max)
-EMERGENCY_KEYWORDS = [
-    "emergency", "fire", "flood", "locked out", "lockout",
-    "lock out", "can't get in", "cant get in", "stuck outside",
-    "help me", "urgent", "police", "ambulance",
-]
-
 
 class NtfyClient:
     """Send notifications via ntfy.sh (self-hosted or public)."""
@@ -32,7 +25,14 @@ class NtfyClient:
         self.url = url.rstrip("/") if url else ""
         self.topic = topic
         self.token = token
-        self._client = httpx.AsyncClient(timeout=10.0)
+        self._publish_url = f"{self.url}/{self.topic}"
+        # One pooled client for the app's lifetime (closed in main.lifespan);
+        # auth rides on the client so send() only builds per-message headers
+        self._client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            headers={"Authorization": f"Bearer {token}"} if token else None,
+        )
 
     @property
     def configured(self) -> bool:
@@ -58,13 +58,8 @@ class NtfyClient:
             logger.warning("ntfy not configured, skipping notification")
             return False
 
-        headers = {}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
-
         # ntfy uses plain-text posting with headers for metadata
-        headers["Title"] = title or "VBR"
-        headers["Priority"] = str(priority)
+        headers = {"Title": title or "VBR", "Priority": str(priority)}
 
         if tags:
             headers["Tags"] = ",".join(tags)
@@ -83,7 +78,7 @@ class NtfyClient:
 
         try:
             resp = await self._client.post(
-                f"{self.url}/{self.topic}",
+                self._publish_url,
                 content=message.encode("utf-8"),
                 headers=headers,
             )
@@ -165,8 +160,3 @@ class NtfyClient:
             tags=["red_circle", "sos"],
         )
 
-
-def is_emergency_message(text: str) -> bool:
-    """Check if a guest message contains emergency keywords."""
-    lower = text.lower()
-    return any(kw in lower for kw in EMERGENCY_KEYWORDS)
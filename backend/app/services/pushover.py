@@ -19,13 +19,6 @@ logger = logging.getLogger(__name__)
 
 PUSHOVER_API_URL = "https://api.pushover.net/1/messages.json"
 
-# Emergency keywords that trigger priority 2
-EMERGENCY_KEYWORDS = [
-    "emergency", "fire", "flood", "locked out", "lockout",
-    "lock out", "can't get in", "cant get in", "stuck outside",
-    "help me", "urgent", "police", "ambulance",
-]
-
 
 class PushoverClient:
     """Send notifications via Pushover."""
@@ -138,8 +131,3 @@ class PushoverClient:
             priority=0,
         )
 
-
-def is_emergency_message(text: str) -> bool:
-    """Check if a guest message contains emergency keywords."""
-    lower = text.lower()
-    return any(kw in lower for kw in EMERGENCY_KEYWORDS)
@@ -5,87 +5,164 @@ Templates are identified by text similarity — if a host message body
 a template.
 
 This runs as a batch process after sync, and also provides a real-time
-check for new messages.
+check for new messages. The batch is incremental: each host message is
+fingerprinted once (Message.template_fp) and counted per fingerprint in
+TemplateFingerprint, so a run only hashes messages synced since the last.
 """
 
+import hashlib
 import logging
 from collections import defaultdict
 
 from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Message
+from app.db.database import IS_POSTGRES
+from app.db.models import Message, TemplateFingerprint
 
 logger = logging.getLogger(__name__)
 
+# Host messages fetched per round trip while fingerprinting
+SCAN_BATCH_SIZE = 1000
+# IDs per UPDATE ... WHERE id IN (...), well under SQLite's bound-parameter limit
+UPDATE_BATCH_SIZE = 500
+
+
+_GREETING_PREFIXES = ("hi ", "hello ", "hey ", "dear ")
+_GREETING_LEN = max(map(len, _GREETING_PREFIXES))
+
 
 def _normalize_body(body: str) -> str:
     """Strip greeting line and normalize for fingerprint comparison."""
     lines = body.strip().split("\n")
-    # Remove greeting line (Hi X, Hello X, etc.)
-    if lines and any(
-        lines[0].lower().startswith(g) for g in ("hi ", "hello ", "hey ", "dear ")
-    ):
+    # Remove greeting line (Hi X, Hello X, etc.) — only the prefix needs lowercasing
+    if lines[0][:_GREETING_LEN].lower().startswith(_GREETING_PREFIXES):
         lines = lines[1:]
     # Join and collapse whitespace, take first 150 chars as fingerprint
     text = " ".join(" ".join(lines).split())
     return text[:150]
 
 
+def _fingerprint(body: str) -> bytes:
+    """8-byte digest of the normalized body — a compact dict/set key."""
+    return hashlib.blake2b(_normalize_body(body).encode(), digest_size=8).digest()
+
+
+# Fingerprints known to be templates, for is_likely_template. Loaded from
+# TemplateFingerprint on the first detection run and extended by each run
+# (counts only grow, so a fingerprint never stops being a template).
+_known_templates: set[bytes] | None = None
+
+
+def invalidate_known_templates():
+    """Drop the in-memory template fingerprints; the next detection run reloads them."""
+    global _known_templates
+    _known_templates = None
+
+
+async def _set_template_flag(session: AsyncSession, ids: list[int], value: bool) -> None:
+    """Set is_template on the given messages, UPDATE_BATCH_SIZE ids per statement."""
+    for i in range(0, len(ids), UPDATE_BATCH_SIZE):
+        await session.execute(
+            update(Message)
+            .where(Message.id.in_(ids[i : i + UPDATE_BATCH_SIZE]))
+            .values(is_template=value)
+        )
+
+
 async def detect_and_tag_templates(session: AsyncSession, min_occurrences: int = 3) -> int:
-    """Scan all host messages and tag those appearing 3+ times as templates.
+    """Fingerprint host messages added since the last run and tag templates.
 
-    Returns the number of messages tagged.
+    A fingerprint reaching min_occurrences tags every message sharing it,
+    earlier ones included. Returns the number of messages newly tagged.
     """
-    result = await session.execute(
-        select(Message.id, Message.body).where(Message.sender == "host")
+    global _known_templates
+    if _known_templates is None:
+        result = await session.execute(
+            select(TemplateFingerprint.fingerprint).where(TemplateFingerprint.count >= min_occurrences)
+        )
+        _known_templates = set(result.scalars())
+
+    # Fingerprint → new message IDs, streaming rows so bodies aren't all held
+    # in memory at once (the first run after upgrading covers every message)
+    new_by_fp: dict[bytes, list[int]] = defaultdict(list)
+    tagged: set[int] = set()
+    result = await session.stream(
+        select(Message.id, Message.body, Message.is_template)
+        .where(Message.sender == "host", Message.template_fp.is_(None))
+        .execution_options(yield_per=SCAN_BATCH_SIZE)
     )
-    rows = result.all()
+    async for msg_id, body, is_template in result:
+        new_by_fp[_fingerprint(body)].append(msg_id)
+        if is_template:
+            tagged.add(msg_id)
 
-    # Build fingerprint → message IDs mapping
-    fingerprints: dict[str, list[int]] = defaultdict(list)
-    for msg_id, body in rows:
-        fp = _normalize_body(body)
-        fingerprints[fp].append(msg_id)
-
-    # Collect IDs of template messages
-    template_ids = []
-    for fp, ids in fingerprints.items():
-        if len(ids) >= min_occurrences:
-            template_ids.extend(ids)
-
-    if not template_ids:
+    if not new_by_fp:
         return 0
 
-    # Batch update
+    fps = list(new_by_fp)
+    previous: dict[bytes, int] = {}
+    for i in range(0, len(fps), UPDATE_BATCH_SIZE):
+        rows = await session.execute(
+            select(TemplateFingerprint.fingerprint, TemplateFingerprint.count)
+            .where(TemplateFingerprint.fingerprint.in_(fps[i : i + UPDATE_BATCH_SIZE]))
+        )
+        previous.update(rows.tuples().all())
+
+    # Store each message's fingerprint and bump the per-fingerprint counts
+    await session.execute(
+        update(Message),
+        [{"id": msg_id, "template_fp": fp} for fp, ids in new_by_fp.items() for msg_id in ids],
+    )
+    upsert = (pg_insert if IS_POSTGRES else sqlite_insert)(TemplateFingerprint)
     await session.execute(
-        update(Message)
-        .where(Message.id.in_(template_ids))
-        .values(is_template=True)
+        upsert.on_conflict_do_update(
+            index_elements=["fingerprint"],
+            set_={"count": TemplateFingerprint.count + upsert.excluded.count},
+        ),
+        [{"fingerprint": fp, "count": len(ids)} for fp, ids in new_by_fp.items()],
     )
 
-    # Also ensure non-templates are unmarked (in case a message was
-    # previously wrongly tagged)
-    non_template_ids = []
-    for fp, ids in fingerprints.items():
-        if len(ids) < min_occurrences:
-            non_template_ids.extend(ids)
-    if non_template_ids:
-        await session.execute(
+    promoted_fps = []  # just reached the threshold: tag earlier messages too
+    tag_ids = []
+    untag_ids = []
+    for fp, ids in new_by_fp.items():
+        before = previous.get(fp, 0)
+        if before + len(ids) < min_occurrences:
+            untag_ids.extend(i for i in ids if i in tagged)
+        elif before < min_occurrences:
+            promoted_fps.append(fp)
+            _known_templates.add(fp)
+        else:
+            tag_ids.extend(i for i in ids if i not in tagged)
+
+    newly_tagged = len(tag_ids)
+    await _set_template_flag(session, tag_ids, True)
+    await _set_template_flag(session, untag_ids, False)
+    for i in range(0, len(promoted_fps), UPDATE_BATCH_SIZE):
+        result = await session.execute(
             update(Message)
-            .where(Message.id.in_(non_template_ids))
-            .values(is_template=False)
+            .where(
+                Message.template_fp.in_(promoted_fps[i : i + UPDATE_BATCH_SIZE]),
+                Message.is_template == False,
+            )
+            .values(is_template=True)
         )
+        newly_tagged += result.rowcount
 
     logger.info(
-        "Template detection: %d templates tagged, %d real replies",
-        len(template_ids),
-        len(non_template_ids),
+        "Template detection: %d new host messages, %d newly tagged as templates",
+        sum(len(ids) for ids in new_by_fp.values()),
+        newly_tagged,
     )
-    return len(template_ids)
+    return newly_tagged
+
 
+def is_likely_template(body: str) -> bool:
+    """Real-time check if a new message matches a known template (no I/O).
 
-def is_likely_template(body: str, known_fingerprints: set[str]) -> bool:
-    """Real-time check if a new message matches known template fingerprints."""
-    fp = _normalize_body(body)
-    return fp in known_fingerprints
+    Always False until the first detection run after startup has loaded them.
+    """
+    return _known_templates is not None and _fingerprint(body) in _known_templates
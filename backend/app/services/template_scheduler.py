@@ -16,18 +16,27 @@ Host Tools templates.
 
 import asyncio
 import logging
+import re
+from collections import defaultdict
 from datetime import date, datetime, timedelta
 
-from sqlalchemy import select, and_
+from sqlalchemy import delete, select, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
-from app.db.database import get_session
+from app.db.database import IS_POSTGRES, get_session
 from app.db.models import MessageTemplate, ScheduledMessageLog, Reservation, Listing
 from app.services.hosttools import HostToolsClient
 
 logger = logging.getLogger(__name__)
 
+_insert = pg_insert if IS_POSTGRES else sqlite_insert
+
+# Template messages in flight to Host Tools at once
+SEND_CONCURRENCY = 8
+
 # Map trigger names to date offsets from check_in/check_out
 TRIGGER_DATE_MAP = {
     "day_before_checkin": ("check_in", -1),
@@ -38,21 +47,21 @@ TRIGGER_DATE_MAP = {
 }
 
 
+_PLACEHOLDER_RE = re.compile(r"\{(?:guest_name|check_in|check_out|listing_name|num_guests)\}")
+
+
 def _substitute_placeholders(body: str, reservation: Reservation, listing: Listing | None) -> str:
-    """Replace placeholders in template body."""
-    guest_first = reservation.guest_name.split()[0] if reservation.guest_name else "Guest"
-    check_in_fmt = reservation.check_in.strftime("%d %b") if reservation.check_in else ""
-    check_out_fmt = reservation.check_out.strftime("%d %b") if reservation.check_out else ""
-    listing_name = listing.name if listing else ""
-
-    return (
-        body
-        .replace("{guest_name}", guest_first)
-        .replace("{check_in}", check_in_fmt)
-        .replace("{check_out}", check_out_fmt)
-        .replace("{listing_name}", listing_name)
-        .replace("{num_guests}", str(reservation.num_guests or ""))
-    )
+    """Replace placeholders in template body (one pass; guest text isn't re-scanned)."""
+    if "{" not in body:
+        return body
+    values = {
+        "{guest_name}": reservation.guest_name.split()[0] if reservation.guest_name else "Guest",
+        "{check_in}": reservation.check_in.strftime("%d %b") if reservation.check_in else "",
+        "{check_out}": reservation.check_out.strftime("%d %b") if reservation.check_out else "",
+        "{listing_name}": listing.name if listing else "",
+        "{num_guests}": str(reservation.num_guests or ""),
+    }
+    return _PLACEHOLDER_RE.sub(lambda m: values[m.group(0)], body)
 
 
 async def check_and_send_templates(hosttools: HostToolsClient) -> int:
@@ -64,100 +73,141 @@ async def check_and_send_templates(hosttools: HostToolsClient) -> int:
     now = datetime.utcnow()
     sent_count = 0
 
+    # [start, end) of each trigger day, built once per tick
+    midnight = datetime.combine(today, datetime.min.time())
+    day_bounds = {
+        offset: (midnight + timedelta(days=offset), midnight + timedelta(days=offset + 1))
+        for _, offset in TRIGGER_DATE_MAP.values()
+    }
+
     async with get_session() as session:
-        # Load enabled templates
+        # Load enabled templates whose send hour has arrived
         result = await session.execute(
-            select(MessageTemplate).where(MessageTemplate.enabled == True)
+            select(MessageTemplate).where(
+                MessageTemplate.enabled == True,
+                MessageTemplate.hours_offset <= now.hour,
+            )
         )
         templates = result.scalars().all()
 
         if not templates:
             return 0
 
+        # Templates due now, with the (date field, day offset) their reservations fall on
+        due = []
         for template in templates:
             trigger_info = TRIGGER_DATE_MAP.get(template.trigger)
             if not trigger_info:
                 logger.warning("Unknown trigger: %s", template.trigger)
                 continue
 
-            date_field, offset = trigger_info
-            target_date = today - timedelta(days=offset)  # reverse: find reservations where date == target
-
-            # Find reservations that match this trigger date
-            if date_field == "check_in":
-                # We want reservations where check_in date == today + offset
-                query = (
-                    select(Reservation)
-                    .options(selectinload(Reservation.listing))
-                    .where(
-                        Reservation.check_in >= datetime.combine(today + timedelta(days=offset), datetime.min.time()),
-                        Reservation.check_in < datetime.combine(today + timedelta(days=offset + 1), datetime.min.time()),
-                    )
-                )
-            else:  # check_out
-                query = (
-                    select(Reservation)
-                    .options(selectinload(Reservation.listing))
-                    .where(
-                        Reservation.check_out >= datetime.combine(today + timedelta(days=offset), datetime.min.time()),
-                        Reservation.check_out < datetime.combine(today + timedelta(days=offset + 1), datetime.min.time()),
-                    )
-                )
+            # We want reservations where check_in/check_out date == today + offset
+            due.append((template, trigger_info))
 
-            res_result = await session.execute(query)
-            reservations = res_result.scalars().unique().all()
+        if not due:
+            return 0
 
-            for reservation in reservations:
+        # One query for every reservation any due template targets
+        windows = []
+        for date_field, offset in {trigger for _, trigger in due}:
+            start, end = day_bounds[offset]
+            column = getattr(Reservation, date_field)
+            windows.append(and_(column >= start, column < end))
+        res_result = await session.execute(
+            select(Reservation)
+            .options(joinedload(Reservation.listing))
+            .where(or_(*windows))
+            .order_by(Reservation.id)
+        )
+        by_day: dict[tuple[str, date], list[Reservation]] = defaultdict(list)
+        for reservation in res_result.scalars():
+            by_day[("check_in", reservation.check_in.date())].append(reservation)
+            by_day[("check_out", reservation.check_out.date())].append(reservation)
+
+        # ...and one for what has already gone out to them
+        reservation_ids = {r.id for rs in by_day.values() for r in rs}
+        already_sent = set()
+        if reservation_ids:
+            log_result = await session.execute(
+                select(ScheduledMessageLog.template_id, ScheduledMessageLog.reservation_id).where(
+                    ScheduledMessageLog.template_id.in_({t.id for t, _ in due}),
+                    ScheduledMessageLog.reservation_id.in_(reservation_ids),
+                )
+            )
+            already_sent = set(log_result.tuples())
+
+        pending = {}  # (template id, reservation id) -> (template, reservation, body)
+        for template, (date_field, offset) in due:
+            for reservation in by_day.get((date_field, day_bounds[offset][0].date()), ()):
                 # Check house_code filter
                 if template.house_code:
                     listing_house = reservation.listing.house_code if reservation.listing else None
                     if listing_house and listing_house != template.house_code and listing_house != "both":
                         continue
 
-                # Check hour — only send if we've passed the scheduled hour
-                if now.hour < template.hours_offset:
-                    continue
-
                 # Check if already sent
-                existing = await session.execute(
-                    select(ScheduledMessageLog).where(
-                        and_(
-                            ScheduledMessageLog.template_id == template.id,
-                            ScheduledMessageLog.reservation_id == reservation.id,
-                        )
-                    )
-                )
-                if existing.scalar_one_or_none():
+                if (template.id, reservation.id) in already_sent:
                     continue
 
                 # Substitute placeholders
                 body = _substitute_placeholders(
                     template.body, reservation, reservation.listing
                 )
+                pending[(template.id, reservation.id)] = (template, reservation, body)
 
-                # Send via Host Tools
-                try:
-                    await hosttools.send_message(reservation.hosttools_id, body)
-                except Exception as e:
-                    logger.error(
-                        "Failed to send template '%s' for reservation %s: %s",
-                        template.name, reservation.hosttools_id, e,
-                    )
-                    continue
+        if not pending:
+            return 0
 
-                # Log it
-                log_entry = ScheduledMessageLog(
-                    template_id=template.id,
-                    reservation_id=reservation.id,
-                    body_sent=body,
+        # Claim every send first; the unique index makes this at-most-once
+        # even if another scheduler run got here in the meantime
+        claim = await session.execute(
+            _insert(ScheduledMessageLog)
+            .values([
+                {"template_id": t.id, "reservation_id": r.id, "body_sent": body}
+                for t, r, body in pending.values()
+            ])
+            .on_conflict_do_nothing(index_elements=["template_id", "reservation_id"])
+            .returning(
+                ScheduledMessageLog.id, ScheduledMessageLog.template_id, ScheduledMessageLog.reservation_id
+            )
+        )
+        claimed = {(template_id, reservation_id): log_id for log_id, template_id, reservation_id in claim}
+        # Commit the claims so the write lock isn't held across the sends
+        await session.commit()
+
+        # Send via Host Tools, a few at a time
+        limit = asyncio.Semaphore(SEND_CONCURRENCY)
+
+        async def send(key: tuple[int, int]) -> None:
+            _, reservation, body = pending[key]
+            async with limit:
+                await hosttools.send_message(reservation.hosttools_id, body)
+
+        keys = list(claimed)
+        results = await asyncio.gather(*(send(key) for key in keys), return_exceptions=True)
+
+        failed_ids = []
+        for key, result in zip(keys, results):
+            template, reservation, _ = pending[key]
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to send template '%s' for reservation %s: %s",
+                    template.name, reservation.hosttools_id, result,
                 )
-                session.add(log_entry)
-                sent_count += 1
+                failed_ids.append(claimed[key])
+                continue
 
-                logger.info(
-                    "Sent template '%s' to %s (reservation %s)",
-                    template.name, reservation.guest_name, reservation.hosttools_id,
-                )
+            sent_count += 1
+            logger.info(
+                "Sent template '%s' to %s (reservation %s)",
+                template.name, reservation.guest_name, reservation.hosttools_id,
+            )
+
+        # Release failed claims so the next run retries them
+        if failed_ids:
+            await session.execute(
+                delete(ScheduledMessageLog).where(ScheduledMessageLog.id.in_(failed_ids))
+            )
 
     return sent_count
 
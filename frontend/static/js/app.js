@@ -12,6 +12,7 @@ const state = {
     // AI draft state
     currentDraft: null,      // { draft, confidence, category }
     draftLoading: false,
+    draftStreamText: '',     // raw model output received so far while streaming
     draftDismissed: false,
     editingDraft: null,      // tracks AI origin when editing
     // Inventory state
@@ -516,6 +517,10 @@ function renderThreadInto(container, showBackButton) {
         inner.appendChild(el('div', 'spinner'));
         inner.appendChild(el('span', '', 'Generating draft...'));
         loading.appendChild(inner);
+        const partial = streamingDraftText(state.draftStreamText);
+        if (partial) {
+            loading.appendChild(el('div', 'draft-body', partial));
+        }
         threadWrap.appendChild(loading);
     } else if (state.currentDraft && !state.draftDismissed) {
         const draftPanel = el('div', 'draft-panel');
@@ -725,22 +730,63 @@ async function sendMessage(inputEl) {
 
 async function generateDraft(reservationId) {
     state.draftLoading = true;
+    state.draftStreamText = '';
     state.currentDraft = null;
     state.draftDismissed = false;
     render();
 
     try {
-        state.currentDraft = await api('/conversations/' + reservationId + '/draft', {
+        // Server-sent events: {text} chunks as Gemini writes, then {done, draft, confidence, ...}
+        const resp = await fetch(API_BASE + '/conversations/' + reservationId + '/draft/stream', {
             method: 'POST',
         });
+        if (resp.status === 401) {
+            state.authenticated = false;
+            state.role = null;
+            state.view = 'login';
+            throw new Error('Not authenticated');
+        }
+        if (!resp.ok) {
+            const text = await resp.text();
+            throw new Error(`${resp.status}: ${text}`);
+        }
+
+        const reader = resp.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) >= 0) {
+                const line = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                if (!line.startsWith('data: ')) continue;
+                const event = JSON.parse(line.slice(6));
+                if (event.error) throw new Error(event.error);
+                if (event.done) {
+                    state.currentDraft = event;
+                } else {
+                    state.draftStreamText += event.text;
+                    render();
+                }
+            }
+        }
     } catch (e) {
         console.error('Failed to generate draft:', e);
         state.currentDraft = null;
     }
     state.draftLoading = false;
+    state.draftStreamText = '';
     render();
 }
 
+// Reply text from partial model output (drops the REPLY:/CONFIDENCE: scaffolding)
+function streamingDraftText(raw) {
+    return raw.replace(/^\s*REPLY:\s*/, '').split('\nCONFIDENCE:')[0].trim();
+}
+
 async function sendDraftAsIs() {
     if (!state.currentDraft || !state.currentReservationId) return;
 